@@ -3,14 +3,22 @@ PDF Extraction Service
 Simple FastAPI service for extracting text from PDFs using PyMuPDF
 """
 import os
+import asyncio
+import hashlib
 import logging
+import multiprocessing
+import signal
 import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from typing import Optional
 from pathlib import Path
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, status
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
 import fitz  # PyMuPDF
 
 # Configure logging
@@ -20,11 +28,76 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Configuration
+BUFFER_SIZE = int(os.getenv("BUFFER_SIZE", str(1 << 20)))  # Upload read chunk size (1 MiB)
+# CPUs this process may run on (a container's CPU limit, not the host's count)
+if hasattr(os, "sched_getaffinity"):
+    AVAILABLE_CPUS = len(os.sched_getaffinity(0))
+else:
+    AVAILABLE_CPUS = os.cpu_count() or 1
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(AVAILABLE_CPUS)))
+MIN_PAGES_PER_WORKER = int(os.getenv("MIN_PAGES_PER_WORKER", "4"))
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "text").lower()  # text | blocks
+# Join words hyphenated across line breaks during extraction ("re-\nsults" -> "results")
+TEXT_DEHYPHENATE = os.getenv("TEXT_DEHYPHENATE", "false").lower() == "true"
+
+PDF_MAGIC = b"%PDF-"
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "256"))  # 0 disables
+
+
+def _init_worker():
+    """Worker process initializer - leave Ctrl-C handling to the parent"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _worker_ready():
+    """No-op task used to start a worker process ahead of the first request"""
+
+
+def start_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Create the PyMuPDF worker pool
+
+    Workers are started by a forkserver rather than forked from this
+    process, which by then runs event loop and executor threads.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["fitz"])
+    return ProcessPoolExecutor(
+        max_workers=EXTRACTION_WORKERS,
+        mp_context=context,
+        initializer=_init_worker
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan context manager for startup/shutdown"""
+    # Startup: start the PyMuPDF workers once instead of per request; one
+    # no-op task per worker starts them all now rather than on first use
+    logger.info(f"Starting {EXTRACTION_WORKERS} PDF extraction worker processes")
+    app.state.pdf_pool = start_pdf_pool()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(app.state.pdf_pool, _worker_ready)
+        for _ in range(EXTRACTION_WORKERS)
+    ))
+    logger.info("✓ PDF extraction workers ready")
+
+    yield  # Server is running
+
+    # Shutdown
+    logger.info("Shutting down PDF extraction workers...")
+    app.state.pdf_pool.shutdown(cancel_futures=True)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="PDF Extraction Service",
     description="Extract text from PDF files using PyMuPDF (fitz)",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 
@@ -32,11 +105,13 @@ app = FastAPI(
 
 class ExtractionResponse(BaseModel):
     """Response model for PDF extraction"""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     success: bool = Field(True, description="Whether extraction succeeded")
     text: str = Field(..., description="Extracted text content")
     pages: int = Field(..., description="Number of pages in PDF")
     text_length: int = Field(..., description="Length of extracted text in characters")
-    metadata: dict = Field(default_factory=dict, description="PDF metadata")
+    metadata: dict[str, str] = Field(default_factory=dict, description="PDF metadata")
 
 
 class ErrorResponse(BaseModel):
@@ -53,6 +128,124 @@ class HealthResponse(BaseModel):
     library: str = Field(..., description="PDF library being used")
 
 
+# ==================== Extraction Cache ====================
+
+# SHA-256 of the PDF bytes -> /extract response body, in least-recently-used order
+extraction_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def cache_get(digest: str) -> Optional[dict]:
+    """Return a cached extraction and mark it as recently used"""
+    result = extraction_cache.get(digest)
+    if result is not None:
+        extraction_cache.move_to_end(digest)
+    return result
+
+
+def cache_put(digest: str, result: dict):
+    """Store an extraction, evicting the least recently used entry when full"""
+    if EXTRACTION_CACHE_SIZE <= 0:
+        return
+    extraction_cache[digest] = result
+    extraction_cache.move_to_end(digest)
+    while len(extraction_cache) > EXTRACTION_CACHE_SIZE:
+        extraction_cache.popitem(last=False)
+
+
+# ==================== Helper Functions ====================
+
+def read_document_info(pdf_path: str) -> tuple[int, dict]:
+    """
+    Read the page count and metadata of a PDF
+
+    Runs in a worker process, like extract_page_range.
+    """
+    with fitz.open(pdf_path) as doc:
+        metadata = {}
+        if doc.metadata:
+            metadata = {
+                "title": doc.metadata.get("title", ""),
+                "author": doc.metadata.get("author", ""),
+                "subject": doc.metadata.get("subject", ""),
+                "creator": doc.metadata.get("creator", ""),
+                "producer": doc.metadata.get("producer", ""),
+                "creation_date": doc.metadata.get("creationDate", ""),
+                "mod_date": doc.metadata.get("modDate", ""),
+                "keywords": doc.metadata.get("keywords", "")
+            }
+        return len(doc), metadata
+
+
+def text_flags(default_flags: int) -> int:
+    """MuPDF text flags for get_text, adding dehyphenation when enabled"""
+    if TEXT_DEHYPHENATE:
+        return default_flags | fitz.TEXT_DEHYPHENATE
+    return default_flags
+
+
+def page_text_from_blocks(page) -> str:
+    """
+    Extract page text as text blocks joined by newlines
+
+    Skips image blocks and keeps MuPDF's native block order, which follows
+    the content stream; re-sorting by position would interleave the columns
+    of two-column papers.
+    """
+    blocks = page.get_text("blocks", flags=text_flags(fitz.TEXTFLAGS_BLOCKS))
+    return "\n".join(block[4] for block in blocks if block[6] == 0)
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> list[str]:
+    """
+    Extract text from pages [start, stop) of a PDF
+
+    Opens its own document so it can run in a separate worker process
+    (PyMuPDF documents are not safe to share across threads).
+    """
+    with fitz.open(pdf_path) as doc:
+        if EXTRACTION_MODE == "blocks":
+            return [page_text_from_blocks(doc.load_page(i)) for i in range(start, stop)]
+        flags = text_flags(fitz.TEXTFLAGS_TEXT)
+        return [doc.load_page(i).get_text("text", flags=flags) for i in range(start, stop)]
+
+
+def split_page_ranges(page_count: int, workers: int) -> list[tuple[int, int]]:
+    """Split page indices into `workers` contiguous, ordered ranges"""
+    size, remainder = divmod(page_count, workers)
+    ranges = []
+    start = 0
+    for i in range(workers):
+        stop = start + size + (1 if i < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+async def extract_pages(pool: ProcessPoolExecutor, pdf_path: str, page_count: int) -> list[str]:
+    """
+    Extract text from every page, in page order
+
+    Large documents are split into page ranges that are extracted in
+    parallel on the worker pool; small ones go to a single worker.
+    """
+    workers = max(1, min(EXTRACTION_WORKERS, page_count // MIN_PAGES_PER_WORKER))
+    ranges = split_page_ranges(page_count, workers)
+
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(pool, extract_page_range, pdf_path, start, stop)
+        for start, stop in ranges
+    ))
+
+    # Each worker's pages are written into their slots of a preallocated list
+    text_parts = [""] * page_count
+    for (start, stop), chunk in zip(ranges, chunks):
+        text_parts[start:stop] = chunk
+
+    logger.debug(f"Extracted {page_count} pages with {workers} workers")
+    return text_parts
+
+
 # ==================== API Endpoints ====================
 
 @app.get("/")
@@ -118,65 +311,92 @@ async def extract_pdf(file: UploadFile = File(...)):
 
     logger.info(f"Extracting text from PDF: {file.filename}")
 
-    try:
-        # Read uploaded file
-        pdf_bytes = await file.read()
+    tmp_path = None
+    pool = app.state.pdf_pool
 
-        if not pdf_bytes:
+    try:
+        # Check the PDF signature before copying anything, since the
+        # filename extension alone is trivially spoofed
+        header = await file.read(len(PDF_MAGIC))
+        if not header:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Empty PDF file"
             )
+        if header != PDF_MAGIC:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File is not a valid PDF"
+            )
 
-        # Open PDF with PyMuPDF
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        # Stream the upload to a temp file in chunks instead of holding the
+        # whole PDF in memory; MuPDF then reads pages from disk on demand.
+        # The content hash is computed on the same pass for the result cache.
+        hasher = hashlib.sha256(header)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp_path = tmp.name
+            tmp.write(header)
+            while chunk := await file.read(BUFFER_SIZE):
+                tmp.write(chunk)
+                hasher.update(chunk)
+
+        digest = hasher.hexdigest()
+        cached = cache_get(digest)
+        if cached is not None:
+            logger.info(f"✓ Cache hit for {file.filename} ({digest[:12]})")
+            return ORJSONResponse(cached)
+
+        # Open the PDF in a worker process; MuPDF never runs on the event loop
+        loop = asyncio.get_running_loop()
+        pages_count, metadata = await loop.run_in_executor(
+            pool, read_document_info, tmp_path
+        )
 
         # Extract text from all pages
-        text_parts = []
-        for page_num, page in enumerate(doc):
-            page_text = page.get_text("text")
-            text_parts.append(page_text)
-            logger.debug(f"Page {page_num + 1}: {len(page_text)} chars")
+        text_parts = await extract_pages(pool, tmp_path, pages_count)
 
         # Join pages with double newline
         full_text = "\n\n".join(text_parts)
 
-        # Extract metadata
-        metadata = {}
-        if doc.metadata:
-            metadata = {
-                "title": doc.metadata.get("title", ""),
-                "author": doc.metadata.get("author", ""),
-                "subject": doc.metadata.get("subject", ""),
-                "creator": doc.metadata.get("creator", ""),
-                "producer": doc.metadata.get("producer", ""),
-                "creation_date": doc.metadata.get("creationDate", ""),
-                "mod_date": doc.metadata.get("modDate", ""),
-                "keywords": doc.metadata.get("keywords", "")
-            }
-
-        pages_count = len(doc)
-        doc.close()
-
         logger.info(
             f"✓ Extraction complete: {pages_count} pages, "
             f"{len(full_text)} chars from {file.filename}"
         )
 
-        return ExtractionResponse(
-            success=True,
-            text=full_text,
-            pages=pages_count,
-            text_length=len(full_text),
-            metadata=metadata
+        # Returned as a plain dict so the (often 100 KB+) text is serialized
+        # once by orjson instead of being re-validated by response_model
+        result = {
+            "success": True,
+            "text": full_text,
+            "pages": pages_count,
+            "text_length": len(full_text),
+            "metadata": metadata,
+        }
+        cache_put(digest, result)
+        return ORJSONResponse(result)
+
+    except HTTPException:
+        raise
+    except BrokenProcessPool:
+        # A worker died (e.g. MuPDF crashed on a malformed file), which
+        # breaks the whole pool; replace it so only this request fails
+        logger.error(f"✗ PDF worker crashed on {file.filename}, restarting the worker pool")
+        if app.state.pdf_pool is pool:
+            app.state.pdf_pool = start_pdf_pool()
+            pool.shutdown(wait=False, cancel_futures=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="PDF extraction failed: worker process crashed"
         )
-
     except Exception as e:
         logger.error(f"Extraction failed: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"PDF extraction failed: {str(e)}"
         )
+    finally:
+        if tmp_path is not None:
+            os.unlink(tmp_path)
 
 
 # ==================== Main ====================
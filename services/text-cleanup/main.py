@@ -1,17 +1,35 @@
 """
 Text Cleanup Service
-FastAPI service using Phi-3 LLM to clean and normalize scientific paper text for TTS
+FastAPI service using a small instruct LLM to clean and normalize scientific paper text for TTS
 """
 import os
+import copy
+import json
 import logging
 import time
+from threading import Thread
 from typing import Optional
 from contextlib import asynccontextmanager
 
+# CPU threading - the OpenMP/MKL settings are read when torch initializes
+# its thread pool, so they must be in the environment before torch is imported
+if hasattr(os, "sched_getaffinity"):
+    AVAILABLE_CPUS = len(os.sched_getaffinity(0))
+else:
+    AVAILABLE_CPUS = os.cpu_count() or 1
+NUM_THREADS = int(os.getenv("NUM_THREADS", str(AVAILABLE_CPUS)))
+os.environ.setdefault("OMP_NUM_THREADS", str(NUM_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(NUM_THREADS))
+os.environ.setdefault("KMP_BLOCKTIME", "1")
+os.environ.setdefault("KMP_AFFINITY", "granularity=fine,compact,1,0")
+
 from fastapi import FastAPI, HTTPException, status
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
+
+import rules
 
 # Configure logging
 logging.basicConfig(
@@ -21,14 +39,34 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuration
-MODEL_NAME = os.getenv("MODEL_NAME", "microsoft/Phi-3-mini-4k-instruct")
+# SmolLM2-360M is ~10x smaller than Phi-3-mini and sufficient for this
+# rule-following rewrite; set MODEL_NAME=microsoft/Phi-3-mini-4k-instruct
+# for the higher-quality (much slower) mode
+MODEL_NAME = os.getenv("MODEL_NAME", "HuggingFaceTB/SmolLM2-360M-Instruct")
 MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", "10000"))
+QUANTIZE = os.getenv("QUANTIZE", "int8").lower()  # int8 | none
+TORCH_DTYPE = os.getenv("TORCH_DTYPE", "auto").lower()  # auto | float32 | bfloat16 | float16
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "512"))  # Target tokens per cleanup chunk
+# Optional speculative decoding: a small model sharing MODEL_NAME's tokenizer
+# (e.g. HuggingFaceTB/SmolLM2-135M-Instruct for the SmolLM2-360M default)
+DRAFT_MODEL_NAME = os.getenv("DRAFT_MODEL_NAME", "")
+NUM_ASSISTANT_TOKENS = int(os.getenv("NUM_ASSISTANT_TOKENS", "5"))
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "false").lower() == "true"
+TORCH_COMPILE_MODE = os.getenv("TORCH_COMPILE_MODE", "reduce-overhead")
 DEVICE = "cpu"  # No GPU available based on user specs
 
 # Global model and tokenizer
 model = None
 tokenizer = None
-text_pipeline = None
+draft_model = None
+
+# Chat template rendered once at startup around a placeholder for the text
+prompt_head = None
+prompt_tail = None
+
+# KV cache of the system prompt, computed once at startup
+prompt_prefix_ids = None
+prompt_cache = None
 
 
 # System prompt for text cleanup
@@ -91,17 +129,376 @@ Apply these rules:
 Return ONLY the cleaned text. Do not add explanations or comments."""
 
 
+# ==================== Helper Functions ====================
+
+def cpu_supports_bf16() -> bool:
+    """Check whether the CPU has native BF16 matmul (AVX512_BF16 or AMX)"""
+    for probe in ("_is_amx_tile_supported", "_is_avx512_bf16_supported"):
+        check = getattr(torch.cpu, probe, None)
+        try:
+            if check is not None and check():
+                return True
+        except Exception:
+            continue
+    return False
+
+
+def select_dtype() -> torch.dtype:
+    """
+    Pick the weight dtype for the model
+
+    INT8 dynamic quantization operates on FP32 weights, so FP32 is kept in
+    that case. Otherwise BF16 is used on CPUs with native BF16 support (half
+    the weight bandwidth of FP32); older CPUs emulate BF16 and are faster
+    in FP32.
+    """
+    if QUANTIZE == "int8":
+        return torch.float32
+
+    if TORCH_DTYPE != "auto":
+        return getattr(torch, TORCH_DTYPE)
+
+    return torch.bfloat16 if cpu_supports_bf16() else torch.float32
+
+
+def configure_threads() -> None:
+    """
+    Pin torch to one intra-op pool sized to the CPUs this process may use
+
+    Decoding is a chain of matmuls, so inter-op parallelism only adds
+    contention; one compact, pinned OpenMP pool avoids thread migration and
+    oversubscription.
+    """
+    torch.set_num_threads(NUM_THREADS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError as e:
+        # Can only be set before any inter-op parallel work has started
+        logger.warning(f"Could not set inter-op threads: {e}")
+
+
+def build_prompt_cache() -> None:
+    """
+    Prefill the system prompt once and keep its KV cache
+
+    Every request starts with the same CLEANUP_PROMPT system message, so its
+    attention keys/values are identical across requests. Computing them at
+    startup removes that prefill from every /cleanup call.
+    """
+    global prompt_prefix_ids, prompt_cache
+
+    prefix = tokenizer.apply_chat_template(
+        [{"role": "system", "content": CLEANUP_PROMPT}],
+        tokenize=False
+    )
+    prefix_ids = tokenizer(prefix, return_tensors="pt", add_special_tokens=False)["input_ids"]
+
+    with torch.inference_mode():
+        prompt_cache = model(prefix_ids, use_cache=True).past_key_values
+    prompt_prefix_ids = prefix_ids[0]
+
+
+def generate_text(
+    prompt: str,
+    max_new_tokens: int,
+    temperature: float,
+    streamer: Optional[TextIteratorStreamer] = None
+) -> str:
+    """
+    Run generation directly on the model with the KV cache enabled
+
+    Calling model.generate skips the pipeline's pre/post-processing, and
+    temperature 0 selects greedy decoding, which is what the rule-based
+    cleanup task wants. When the prompt starts with the cached system
+    prompt, a copy of its KV cache is passed in so only the user text is
+    prefilled. If a streamer is given, tokens are also pushed to it as they
+    are generated.
+
+    With a draft model loaded, generation is speculative: the draft proposes
+    several tokens and the main model verifies them in one forward pass. The
+    prompt cache is not used in that case since the draft model would need
+    its own copy of it.
+    """
+    inputs = tokenizer(prompt, return_tensors="pt", add_special_tokens=False)
+    input_ids = inputs["input_ids"]
+    prompt_length = input_ids.shape[1]
+
+    prefix_length = len(prompt_prefix_ids) if prompt_prefix_ids is not None else 0
+    use_prompt_cache = (
+        draft_model is None
+        and prompt_cache is not None
+        and prompt_length > prefix_length
+        and torch.equal(input_ids[0, :prefix_length], prompt_prefix_ids)
+    )
+
+    generate_kwargs = {
+        "max_new_tokens": max_new_tokens,
+        "num_beams": 1,
+        "use_cache": True,
+        "pad_token_id": tokenizer.eos_token_id,
+    }
+    if temperature > 0:
+        generate_kwargs.update(do_sample=True, temperature=temperature)
+    else:
+        generate_kwargs.update(do_sample=False)
+    if streamer is not None:
+        generate_kwargs["streamer"] = streamer
+    if draft_model is not None:
+        generate_kwargs["assistant_model"] = draft_model
+
+    with torch.inference_mode():
+        if use_prompt_cache:
+            generate_kwargs["past_key_values"] = copy.deepcopy(prompt_cache)
+        output_ids = model.generate(**inputs, **generate_kwargs)
+
+    return tokenizer.decode(output_ids[0, prompt_length:], skip_special_tokens=True)
+
+
+def render_chat_prompt(text: str) -> str:
+    """Render the full chat template for one piece of text"""
+    messages = [
+        {"role": "system", "content": CLEANUP_PROMPT},
+        {"role": "user", "content": f"Clean this scientific text for TTS:\n\n{text}"}
+    ]
+    return tokenizer.apply_chat_template(
+        messages,
+        tokenize=False,
+        add_generation_prompt=True
+    )
+
+
+def build_prompt_template() -> None:
+    """
+    Pre-render the chat template once around a placeholder
+
+    Only the user text changes between requests, so the rendered template is
+    split at the placeholder into a head (system prompt, user header) and a
+    tail (end-of-turn and assistant markers) that requests concatenate around
+    their text instead of running the Jinja template each time.
+    """
+    global prompt_head, prompt_tail
+
+    placeholder = "\x00TEXT\x00"
+    rendered = render_chat_prompt(placeholder)
+    if rendered.count(placeholder) != 1:
+        raise ValueError("Chat template does not preserve the user text verbatim")
+
+    prompt_head, _, prompt_tail = rendered.partition(placeholder)
+
+
+def build_prompt(text: str) -> str:
+    """Build the chat prompt for one piece of text"""
+    if prompt_head is None:
+        return render_chat_prompt(text)
+    return prompt_head + text + prompt_tail
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS) -> list[str]:
+    """
+    Split text into chunks of about max_tokens at paragraph boundaries
+
+    Paragraphs are packed greedily in order; a single paragraph longer
+    than max_tokens becomes its own chunk rather than being cut mid-sentence.
+    """
+    paragraphs = [p for p in text.split("\n\n") if p.strip()]
+    if not paragraphs:
+        return [text]
+
+    lengths = [len(ids) for ids in tokenizer(paragraphs, add_special_tokens=False)["input_ids"]]
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph, length in zip(paragraphs, lengths):
+        if current and current_tokens + length > max_tokens:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(paragraph)
+        current_tokens += length
+    chunks.append("\n\n".join(current))
+
+    return chunks
+
+
+def generate_batch(prompts: list[str], max_new_tokens: int, temperature: float) -> list[str]:
+    """
+    Generate completions for several prompts in one model.generate call
+
+    Prompts are left-padded into a single (batch, length) tensor so every
+    decode step runs one larger matmul instead of one per chunk. A single
+    prompt goes through generate_text to reuse the system prompt KV cache.
+    """
+    if len(prompts) == 1:
+        return [generate_text(prompts[0], max_new_tokens, temperature)]
+
+    inputs = tokenizer(
+        prompts,
+        return_tensors="pt",
+        padding=True,
+        add_special_tokens=False
+    )
+    prompt_length = inputs["input_ids"].shape[1]
+
+    generate_kwargs = {
+        "max_new_tokens": max_new_tokens,
+        "num_beams": 1,
+        "use_cache": True,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    if temperature > 0:
+        generate_kwargs.update(do_sample=True, temperature=temperature)
+    else:
+        generate_kwargs.update(do_sample=False)
+
+    with torch.inference_mode():
+        output_ids = model.generate(**inputs, **generate_kwargs)
+
+    return tokenizer.batch_decode(output_ids[:, prompt_length:], skip_special_tokens=True)
+
+
+def compile_model() -> None:
+    """
+    Compile the model's forward pass with torch.compile and warm it up
+
+    Fuses the many small per-token kernels of the decode loop and removes
+    Python overhead between them. Compilation happens on the first call, so
+    a short generation is run here rather than on the first request. Falls
+    back to eager mode if compilation fails (e.g. for ops in quantized
+    layers that the compiler does not support).
+    """
+    eager_forward = model.forward
+    try:
+        model.forward = torch.compile(
+            eager_forward,
+            mode=TORCH_COMPILE_MODE,
+            dynamic=True,
+            fullgraph=False
+        )
+        generate_text(build_prompt("Warm up (Smith, 2020)."), max_new_tokens=8, temperature=0.0)
+        logger.info(f"✓ Compiled model forward (mode={TORCH_COMPILE_MODE})")
+    except Exception as e:
+        model.forward = eager_forward
+        logger.warning(f"torch.compile failed, using eager mode: {e}")
+
+
+def sse_event(data: dict) -> str:
+    """Format a dict as a Server-Sent Events data message"""
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def stream_cleanup(chunks: list[str], max_new_tokens: int, temperature: float):
+    """
+    Clean chunks one after another, yielding SSE events as tokens arrive
+
+    Generation runs in a background thread that feeds a TextIteratorStreamer;
+    this generator relays the decoded text as {"chunk", "text"} events and
+    finishes with a {"done": true} event (or {"error": ...} on failure).
+    """
+    start_time = time.time()
+
+    for index, chunk in enumerate(chunks):
+        if index > 0:
+            yield sse_event({"chunk": index, "text": "\n\n"})
+
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+
+        def run_generation():
+            try:
+                generate_text(build_prompt(chunk), max_new_tokens, temperature, streamer=streamer)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        thread = Thread(target=run_generation, daemon=True)
+        thread.start()
+        for text in streamer:
+            if text:
+                yield sse_event({"chunk": index, "text": text})
+        thread.join()
+
+        if errors:
+            logger.error(f"Streaming cleanup failed: {errors[0]}")
+            yield sse_event({"error": f"Text cleanup failed: {errors[0]}"})
+            return
+
+    processing_time = time.time() - start_time
+    logger.info(f"✓ Streaming cleanup complete: {len(chunks)} chunks in {processing_time:.2f}s")
+    yield sse_event({
+        "done": True,
+        "chunks": len(chunks),
+        "processing_time_seconds": round(processing_time, 2)
+    })
+
+
+def load_draft_model() -> None:
+    """
+    Load DRAFT_MODEL_NAME as the assistant model for speculative decoding
+
+    Assisted generation compares token ids directly, so the draft must use
+    exactly the same vocabulary as the main model.
+    """
+    global draft_model
+
+    draft_tokenizer = AutoTokenizer.from_pretrained(
+        DRAFT_MODEL_NAME,
+        trust_remote_code=True
+    )
+    if draft_tokenizer.get_vocab() != tokenizer.get_vocab():
+        raise ValueError(f"{DRAFT_MODEL_NAME} does not share the tokenizer of {MODEL_NAME}")
+
+    draft = AutoModelForCausalLM.from_pretrained(
+        DRAFT_MODEL_NAME,
+        torch_dtype=select_dtype(),
+        trust_remote_code=True,
+        device_map="cpu"
+    )
+    if QUANTIZE == "int8":
+        draft = quantize_model(draft)
+    draft.eval()
+    draft.generation_config.num_assistant_tokens = NUM_ASSISTANT_TOKENS
+
+    draft_model = draft
+
+
+def quantize_model(fp32_model):
+    """
+    Apply INT8 weight-only dynamic quantization to the model's Linear layers
+
+    CPU decoding is bound by reading the weights for every generated token,
+    so storing Linear weights as int8 cuts memory traffic ~4x. Falls back to
+    the unquantized model if the quantized kernels are unavailable.
+    """
+    try:
+        quantized = torch.ao.quantization.quantize_dynamic(
+            fp32_model,
+            {torch.nn.Linear},
+            dtype=torch.qint8
+        )
+        logger.info("✓ Applied INT8 dynamic quantization")
+        return quantized
+    except Exception as e:
+        logger.warning(f"INT8 quantization failed, using FP32 weights: {e}")
+        return fp32_model
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown"""
     # Startup
-    global model, tokenizer, text_pipeline
+    global model, tokenizer
     logger.info("=" * 60)
     logger.info("Text Cleanup Service Starting...")
     logger.info("=" * 60)
     logger.info(f"Model: {MODEL_NAME}")
     logger.info(f"Device: {DEVICE}")
+    logger.info(f"Quantization: {QUANTIZE}")
+    logger.info(f"Threads: {NUM_THREADS}")
     logger.info(f"Max text length: {MAX_TEXT_LENGTH}")
+    logger.info(f"Chunk size: {CHUNK_TOKENS} tokens")
+
+    configure_threads()
 
     try:
         logger.info("Loading tokenizer...")
@@ -109,22 +506,50 @@ async def lifespan(app: FastAPI):
             MODEL_NAME,
             trust_remote_code=True
         )
-
-        logger.info("Loading model (this may take a minute)...")
+        # Batched generation needs left padding so every prompt ends at the
+        # same position and new tokens are appended directly after it
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        dtype = select_dtype()
+        logger.info(f"Loading model in {dtype} (this may take a minute)...")
         model = AutoModelForCausalLM.from_pretrained(
             MODEL_NAME,
-            torch_dtype=torch.float32,  # Use float32 for CPU
+            torch_dtype=dtype,
             trust_remote_code=True,
             device_map="cpu"
         )
 
-        logger.info("Creating text generation pipeline...")
-        text_pipeline = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            device=DEVICE
-        )
+        if QUANTIZE == "int8":
+            logger.info("Quantizing model weights to INT8...")
+            model = quantize_model(model)
+
+        model.eval()
+
+        try:
+            build_prompt_template()
+        except Exception as e:
+            logger.warning(f"Could not pre-render chat template, rendering per request: {e}")
+
+        logger.info("Caching system prompt...")
+        try:
+            build_prompt_cache()
+            logger.info(f"✓ Cached system prompt ({len(prompt_prefix_ids)} tokens)")
+        except Exception as e:
+            logger.warning(f"Could not cache system prompt, prefilling per request: {e}")
+
+        if DRAFT_MODEL_NAME:
+            logger.info(f"Loading draft model {DRAFT_MODEL_NAME}...")
+            try:
+                load_draft_model()
+                logger.info(f"✓ Speculative decoding enabled ({NUM_ASSISTANT_TOKENS} draft tokens)")
+            except Exception as e:
+                logger.warning(f"Could not load draft model, decoding without it: {e}")
+
+        if TORCH_COMPILE:
+            logger.info("Compiling model (this may take a few minutes)...")
+            compile_model()
 
         logger.info("✓ Model loaded successfully")
         logger.info("✓ Text cleanup service ready")
@@ -141,7 +566,7 @@ async def lifespan(app: FastAPI):
 # Initialize FastAPI app
 app = FastAPI(
     title="Text Cleanup Service",
-    description="Clean and normalize scientific paper text using Phi-3 LLM",
+    description="Clean and normalize scientific paper text using a small instruct LLM",
     version="1.0.0",
     lifespan=lifespan,
 )
@@ -159,18 +584,20 @@ class CleanupRequest(BaseModel):
     )
     max_tokens: Optional[int] = Field(
         4000,
-        description="Maximum tokens to generate"
+        description="Maximum tokens to generate per chunk"
     )
     temperature: Optional[float] = Field(
-        0.3,
+        0.0,
         ge=0.0,
         le=1.0,
-        description="Generation temperature (lower = more deterministic)"
+        description="Generation temperature (0 = greedy, deterministic decoding)"
     )
 
 
 class CleanupResponse(BaseModel):
     """Response model for successful cleanup"""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     success: bool = Field(True, description="Whether cleanup succeeded")
     cleaned_text: str = Field(..., description="Cleaned and normalized text")
     original_length: int = Field(..., description="Length of original text")
@@ -206,7 +633,9 @@ async def root():
         "model": MODEL_NAME,
         "endpoints": {
             "health": "GET /health",
-            "cleanup": "POST /cleanup"
+            "cleanup": "POST /cleanup",
+            "cleanup_stream": "POST /cleanup/stream",
+            "cleanup_fast": "POST /cleanup/fast"
         }
     }
 
@@ -247,14 +676,14 @@ async def cleanup_text(request: CleanupRequest):
     ```json
     {
         "text": "The results (Smith, 2020) show that C. quinquefasciatus...",
-        "temperature": 0.3,
+        "temperature": 0.0,
         "max_tokens": 4000
     }
     ```
     """
     start_time = time.time()
 
-    if text_pipeline is None:
+    if model is None or tokenizer is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Model not loaded - service not ready"
@@ -264,31 +693,18 @@ async def cleanup_text(request: CleanupRequest):
         original_length = len(request.text)
         logger.info(f"Cleaning text: {original_length} chars")
 
-        # Create the prompt
-        messages = [
-            {"role": "system", "content": CLEANUP_PROMPT},
-            {"role": "user", "content": f"Clean this scientific text for TTS:\n\n{request.text}"}
-        ]
-
-        # Format for Phi-3
-        prompt = tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True
-        )
+        # Cleanup is paragraph-local, so long texts are split into chunks
+        # that are cleaned together in one batched generate call
+        chunks = chunk_text(request.text)
+        if len(chunks) > 1:
+            logger.info(f"Split into {len(chunks)} chunks")
 
-        # Generate cleaned text
-        result = text_pipeline(
-            prompt,
+        cleaned_chunks = generate_batch(
+            [build_prompt(chunk) for chunk in chunks],
             max_new_tokens=request.max_tokens,
-            temperature=request.temperature,
-            do_sample=request.temperature > 0,
-            return_full_text=False,
-            pad_token_id=tokenizer.eos_token_id
+            temperature=request.temperature or 0.0
         )
-
-        # Extract cleaned text
-        cleaned_text = result[0]['generated_text'].strip()
+        cleaned_text = "\n\n".join(chunk.strip() for chunk in cleaned_chunks).strip()
 
         # Calculate stats
         cleaned_length = len(cleaned_text)
@@ -317,6 +733,65 @@ async def cleanup_text(request: CleanupRequest):
         )
 
 
+@app.post("/cleanup/stream")
+async def cleanup_text_stream(request: CleanupRequest):
+    """
+    Clean scientific text for TTS, streaming the output as it is generated
+
+    Same request body as /cleanup. Returns a text/event-stream of JSON
+    events: {"chunk": n, "text": "..."} for each piece of cleaned text, then
+    a final {"done": true, ...} event. Chunks are generated in order, so a
+    client can start downstream TTS before the whole text is cleaned.
+    """
+    if model is None or tokenizer is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded - service not ready"
+        )
+
+    chunks = chunk_text(request.text)
+    logger.info(f"Streaming cleanup: {len(request.text)} chars in {len(chunks)} chunks")
+
+    return StreamingResponse(
+        stream_cleanup(chunks, request.max_tokens, request.temperature or 0.0),
+        media_type="text/event-stream"
+    )
+
+
+@app.post("/cleanup/fast", response_model=CleanupResponse)
+async def cleanup_text_fast(request: CleanupRequest):
+    """
+    Clean scientific text with deterministic regex rules (no LLM)
+
+    Applies the same citation, figure reference, URL, LaTeX, abbreviation
+    and Greek letter rules as /cleanup in a single linear pass per rule.
+    Species name expansion is not covered - use /cleanup for that.
+    Does not require the model to be loaded.
+    """
+    start_time = time.time()
+
+    original_length = len(request.text)
+    cleaned_text = rules.clean_text(request.text)
+
+    cleaned_length = len(cleaned_text)
+    reduction = ((original_length - cleaned_length) / original_length * 100) if original_length > 0 else 0
+    processing_time = time.time() - start_time
+
+    logger.info(
+        f"✓ Fast cleanup complete: {original_length} → {cleaned_length} chars "
+        f"({reduction:.1f}% reduction) in {processing_time:.4f}s"
+    )
+
+    return CleanupResponse(
+        success=True,
+        cleaned_text=cleaned_text,
+        original_length=original_length,
+        cleaned_length=cleaned_length,
+        reduction_percent=round(reduction, 2),
+        processing_time_seconds=round(processing_time, 4)
+    )
+
+
 # ==================== Main ====================
 
 if __name__ == "__main__":
@@ -327,6 +802,8 @@ if __name__ == "__main__":
 
     logger.info(f"Starting text cleanup service on {host}:{port}")
 
+    # A single worker process: extra uvicorn workers would each load a copy
+    # of the model and compete for the same cores
     uvicorn.run(
         app,
         host=host,
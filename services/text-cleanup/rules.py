@@ -0,0 +1,110 @@
+"""
+Rule-based text cleanup
+Deterministic regex/translate implementation of the CLEANUP_PROMPT rules
+"""
+import re
+
+# Citations: [1], [1-3], [1, 2], [Smith et al.]
+BRACKET_CITATION = re.compile(r'\s*\[(?:\d+(?:\s*[,\u2013-]\s*\d+)*|[A-Z][A-Za-z]+ et al\.?)\]')
+
+# Citations: (Smith, 2020), (Smith and Jones, 2019), (Smith et al., 2019; Lee, 2021);
+# only author-year shapes, so other parentheticals ending in a year are kept
+AUTHOR_YEAR = (
+    r"[A-Z][A-Za-z'-]+(?:\s+et al\.|\s+(?:and|&)\s+[A-Z][A-Za-z'-]+)?"
+    r",?\s+\d{4}[a-z]?(?:,\s*\d{4}[a-z]?)*"
+)
+PAREN_CITATION = re.compile(
+    rf'\s*\((?:see\s+)?{AUTHOR_YEAR}(?:;\s*{AUTHOR_YEAR})*\)'
+)
+
+ET_AL = re.compile(r'\s+et al\.')
+
+# Figure/table references, including chains like "Figure 2 and Table 1"
+# or "Figs. 1, 2, and 3", so a run is removed whole with its lead-in
+FIGURE_LABEL = r'(?:Supplementary\s+)?(?:Fig(?:ure)?s?\.?|Tables?)\s*'
+FIGURE_NUMBER = r'S?\d+[A-Za-z]?'
+FIGURE_REF = (
+    rf'{FIGURE_LABEL}{FIGURE_NUMBER}'
+    rf'(?:\s*(?:,\s*(?:and|or)\b|and\b|or\b|[,\u2013-])\s*(?:{FIGURE_LABEL})?{FIGURE_NUMBER})*'
+)
+PAREN_FIGURE = re.compile(rf'\s*\((?:see\s+)?{FIGURE_REF}\)')
+INLINE_FIGURE = re.compile(rf'\s+(?:as\s+shown\s+)?in\s+{FIGURE_REF}')
+BARE_FIGURE = re.compile(rf'\b{FIGURE_REF}\b')
+
+# Links and contact details
+# (sentence punctuation right after a link is kept)
+URL = re.compile(r'(?:https?://|www\.)\S*[^\s.,;:]|\bdoi:\s*\S*[^\s.,;:]', re.IGNORECASE)
+EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+
+# LaTeX
+# Inline math must not start with a digit or space or end with a space, so
+# prices like "$5 and $10" are not taken for math
+LATEX_MATH = re.compile(r'\$\$[^$]+\$\$|\$(?![\d\s])[^$]+(?<!\s)\$')
+LATEX_COMMAND = re.compile(r'\\[a-zA-Z]+\{([^}]*)\}')
+
+# Words broken across lines: "re-\nsults" -> "results"
+BROKEN_WORD = re.compile(r'(\w)-\n(\w)')
+
+ABBREVIATIONS = {
+    'e.g.,': 'for example,',
+    'e.g.': 'for example',
+    'i.e.,': 'that is,',
+    'i.e.': 'that is',
+    'etc.': 'and so forth',
+    'vs.': 'versus',
+    'LD\u2085\u2080': 'lethal dose fifty',
+    'LD50': 'lethal dose fifty',
+    '\u00b5l': 'microliter',
+    '\u03bcl': 'microliter',
+}
+ABBREVIATION = re.compile(
+    '|'.join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True))
+)
+
+# Single-character substitutions done in one str.translate pass
+CHAR_TABLE = str.maketrans({
+    '\u03b1': 'alpha',
+    '\u03b2': 'beta',
+    '\u03b3': 'gamma',
+    '\u03b4': 'delta',
+    '\u03bc': 'mu',
+    '\u0394': 'delta',
+    '\u201c': '"',
+    '\u201d': '"',
+    '\u2018': "'",
+    '\u2019': "'",
+    '\u00b9': None,
+    '\u00b2': None,
+    '\u00b3': None,
+    '\u2020': None,
+    '\u2021': None,
+})
+
+WHITESPACE = re.compile(r'[ \t]+')
+SPACE_BEFORE_PUNCT = re.compile(r' +([.,;:!?])')
+
+
+def clean_text(text: str) -> str:
+    """
+    Apply the deterministic cleanup rules to text
+
+    Covers citations, figure/table references, URLs, emails, LaTeX,
+    abbreviations, Greek letters and formatting. Species name expansion
+    needs domain knowledge and is left to the LLM endpoint.
+    """
+    text = BROKEN_WORD.sub(r'\1\2', text)
+    text = LATEX_MATH.sub('', text)
+    text = LATEX_COMMAND.sub(r'\1', text)
+    text = URL.sub('', text)
+    text = EMAIL.sub('', text)
+    text = BRACKET_CITATION.sub('', text)
+    text = PAREN_FIGURE.sub('', text)
+    text = PAREN_CITATION.sub('', text)
+    text = ET_AL.sub('', text)
+    text = INLINE_FIGURE.sub('', text)
+    text = BARE_FIGURE.sub('', text)
+    text = ABBREVIATION.sub(lambda m: ABBREVIATIONS[m.group(0)], text)
+    text = text.translate(CHAR_TABLE)
+    text = WHITESPACE.sub(' ', text)
+    text = SPACE_BEFORE_PUNCT.sub(r'\1', text)
+    return text.strip()
@@ -0,0 +1,55 @@
+"""
+Unit tests for the rule-based /cleanup/fast rules
+"""
+import pytest
+
+from rules import clean_text
+
+
+class TestCitations:
+    """Test citation removal"""
+
+    def test_remove_author_year_citations(self):
+        """Test author-year citations are removed"""
+        text = "Resistance rose (Smith et al., 2019; Lee, 2021) and fell (Smith and Jones, 2020a)."
+        assert clean_text(text) == "Resistance rose and fell."
+
+    def test_keep_non_citation_parenthetical(self):
+        """Test a parenthetical that only ends in a year is kept"""
+        text = "Samples (Group A, 2020) were taken."
+        assert clean_text(text) == text
+
+
+class TestFigures:
+    """Test figure/table reference removal"""
+
+    def test_remove_chained_references(self):
+        """Test a chained reference is removed together with its lead-in"""
+        text = "Results are as shown in Figure 2 and Table 1."
+        assert clean_text(text) == "Results are."
+
+
+class TestLinks:
+    """Test URL removal"""
+
+    def test_keep_sentence_final_period(self):
+        """Test the period after a URL stays with the sentence"""
+        text = "See https://example.org/x. Next sentence."
+        assert clean_text(text) == "See. Next sentence."
+
+
+class TestLatex:
+    """Test LaTeX math removal"""
+
+    def test_remove_inline_math(self):
+        """Test inline math is removed"""
+        assert "$" not in clean_text("The value $x^2$ grows.")
+
+    def test_keep_prices(self):
+        """Test dollar amounts are not taken for math"""
+        text = "The kit costs $5 and the refill $10 respectively."
+        assert clean_text(text) == text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,11 @@
+#!/bin/sh
+# Start the service, optionally bound to one NUMA node.
+# With NUMA_NODE set, threads run only on that node's cores and all memory
+# (model weights, KV cache) is allocated from its local RAM.
+set -e
+
+if [ -n "$NUMA_NODE" ] && command -v numactl >/dev/null 2>&1; then
+    exec numactl --cpunodebind="$NUMA_NODE" --membind="$NUMA_NODE" python main.py
+fi
+
+exec python main.py
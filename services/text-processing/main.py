@@ -3,17 +3,49 @@ Text Processing Service
 Two-stage LLM pipeline: Phi-3-mini-128k (cleanup) → Phi-3-medium-128k (reorganization)
 """
 import os
+import asyncio
+import copy
+import hashlib
+import json
 import logging
 import time
+from collections import OrderedDict
 from typing import Optional
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+# CPU threading - the OpenMP/MKL settings are read when torch initializes
+# its thread pool, so they must be in the environment before torch is imported
+if hasattr(os, "sched_getaffinity"):
+    AVAILABLE_CPUS = len(os.sched_getaffinity(0))
+else:
+    AVAILABLE_CPUS = os.cpu_count() or 1
+NUM_THREADS = int(os.getenv("NUM_THREADS", os.getenv("OMP_NUM_THREADS", str(AVAILABLE_CPUS))))
+os.environ.setdefault("OMP_NUM_THREADS", str(NUM_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(NUM_THREADS))
+os.environ.setdefault("KMP_BLOCKTIME", "1")
+os.environ.setdefault("KMP_AFFINITY", "granularity=fine,compact,1,0")
 
 from fastapi import FastAPI, HTTPException, status
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 
-from prompts import STAGE1_CLEANUP_PROMPT, STAGE2_REORGANIZATION_PROMPT
+import rule_cleanup
+import section_detect
+from prompts import (
+    CITATION_RULES,
+    FIGURE_RULES,
+    GREEK_RULES,
+    LATEX_RULES,
+    STAGE1_CLEANUP_PROMPT,
+    STAGE1_RESIDUAL_PROMPT,
+    STAGE1_RULES,
+    STAGE2_REORGANIZATION_PROMPT,
+    SYMBOL_RULES,
+    compose_stage1_prompt,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -27,74 +59,109 @@ STAGE1_MODEL = os.getenv("STAGE1_MODEL", "microsoft/Phi-3-mini-128k-instruct")
 STAGE2_MODEL = os.getenv("STAGE2_MODEL", "microsoft/Phi-3-medium-128k-instruct")
 MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", "200000"))  # ~50k words
 LOAD_BOTH_MODELS = os.getenv("LOAD_BOTH_MODELS", "true").lower() == "true"
+# rules: regex cleanup only (no Stage 1 model), hybrid: regex cleanup then
+# the LLM for the remaining judgement calls, llm: the full LLM prompt
+STAGE1_MODE = os.getenv("STAGE1_MODE", "hybrid").lower()
+# rules: regex section detection (no Stage 2 model), llm: the Stage 2 model
+STAGE2_MODE = os.getenv("STAGE2_MODE", "rules").lower()
+MAX_NEW_TOKENS_CAP = int(os.getenv("MAX_NEW_TOKENS_CAP", "16000"))  # Hard limit per stage
+STAGE1_CHUNK_TOKENS = int(os.getenv("STAGE1_CHUNK_TOKENS", "2000"))  # Stage 1 chunk size
+STAGE1_BATCH_SIZE = int(os.getenv("STAGE1_BATCH_SIZE", "4"))  # Stage 1 chunks per forward pass
+QUANTIZE = os.getenv("QUANTIZE", "int8").lower()  # int8 | none
+TORCH_DTYPE = os.getenv("TORCH_DTYPE", "auto").lower()  # auto | float32 | bfloat16
+USE_IPEX = os.getenv("USE_IPEX", "false").lower() == "true"
+# Optional RAM budget (e.g. "16GiB"); layers beyond it are offloaded to disk
+MAX_CPU_MEMORY = os.getenv("MAX_CPU_MEMORY", "")
+OFFLOAD_FOLDER = os.getenv("OFFLOAD_FOLDER", "/tmp/offload")
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "false").lower() == "true"
+TORCH_COMPILE_MODE = os.getenv("TORCH_COMPILE_MODE", "reduce-overhead")
+# sdpa: fused scaled_dot_product_attention (no materialized L x L score matrix)
+ATTN_IMPLEMENTATION = os.getenv("ATTN_IMPLEMENTATION", "sdpa").lower()  # sdpa | eager
+BACKEND = os.getenv("BACKEND", "transformers").lower()  # transformers | llama_cpp
+# static: preallocated KV cache (model and transformers support required)
+KV_CACHE = os.getenv("KV_CACHE", "dynamic").lower()  # dynamic | static
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "64"))  # 0 disables
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "4"))  # System prompt KV caches per stage
+# STAGE2_MODE=llm: use the loaded Stage 1 model as draft for Stage 2
+SPECULATIVE_DECODING = os.getenv("SPECULATIVE_DECODING", "true").lower() == "true"
+NUM_ASSISTANT_TOKENS = int(os.getenv("NUM_ASSISTANT_TOKENS", "5"))
+
+# llama.cpp backend: GGUF files (e.g. Q4_K_M) converted from the HF models
+STAGE1_GGUF = os.getenv("STAGE1_GGUF", "/app/models/gguf/Phi-3-mini-128k-instruct-Q4_K_M.gguf")
+STAGE2_GGUF = os.getenv("STAGE2_GGUF", "/app/models/gguf/Phi-3-medium-128k-instruct-Q4_K_M.gguf")
+LLAMA_N_CTX = int(os.getenv("LLAMA_N_CTX", "131072"))
+LLAMA_N_BATCH = int(os.getenv("LLAMA_N_BATCH", "512"))
+# RAM for saved llama.cpp KV states, so a repeated system prompt prefix is
+# restored instead of re-evaluated; 0 disables
+LLAMA_PROMPT_CACHE_MB = int(os.getenv("LLAMA_PROMPT_CACHE_MB", "2048"))
 DEVICE = "cpu"  # No GPU
 
-# Global model instances
-stage1_model = None
-stage1_tokenizer = None
-stage1_pipeline = None
+# INT8 CPU matmul latency is very sensitive to thread count: one intra-op
+# thread per core this process may run on, no inter-op parallelism
+torch.set_num_threads(NUM_THREADS)
+torch.set_num_interop_threads(1)
+
 
-stage2_model = None
-stage2_tokenizer = None
-stage2_pipeline = None
+@dataclass
+class StageHandle:
+    """
+    Loaded model objects for one pipeline stage
+
+    Stored on app.state; lock serializes generation (and load/unload) on
+    the stage's model so concurrent requests don't interleave compute.
+    """
+    model: object = None
+    tokenizer: object = None
+    pipeline: object = None
+    llama: object = None
+    # System prompt -> (prefix ids, past_key_values), least recently used first
+    prompt_caches: OrderedDict = field(default_factory=OrderedDict)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def loaded(self) -> bool:
+        """Whether the model is loaded for the configured backend"""
+        return self.pipeline is not None or self.llama is not None
+
+    def clear(self):
+        """Drop references to the loaded model objects"""
+        self.model = None
+        self.tokenizer = None
+        self.pipeline = None
+        self.llama = None
+        self.prompt_caches = OrderedDict()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown"""
-    global stage1_model, stage1_tokenizer, stage1_pipeline
-    global stage2_model, stage2_tokenizer, stage2_pipeline
-
     logger.info("=" * 60)
     logger.info("Text Processing Service Starting...")
     logger.info("=" * 60)
     logger.info(f"Stage 1 Model: {STAGE1_MODEL}")
     logger.info(f"Stage 2 Model: {STAGE2_MODEL}")
     logger.info(f"Load both models: {LOAD_BOTH_MODELS}")
-    logger.info(f"Device: {DEVICE}")
+    logger.info(f"Stage 1 mode: {STAGE1_MODE}")
+    logger.info(f"Stage 2 mode: {STAGE2_MODE}")
+    if STAGE2_MODE == "llm":
+        logger.info(f"Speculative decoding: {SPECULATIVE_DECODING}")
+    logger.info(f"Device: {DEVICE} ({NUM_THREADS} threads)")
+    logger.info(f"Backend: {BACKEND}")
+    logger.info(f"Quantization: {QUANTIZE}")
+    logger.info(f"Attention: {ATTN_IMPLEMENTATION}")
+    logger.info(f"KV cache: {KV_CACHE}")
     logger.info(f"Max text length: {MAX_TEXT_LENGTH}")
 
+    app.state.stage1 = StageHandle()
+    app.state.stage2 = StageHandle()
+
     try:
         if LOAD_BOTH_MODELS:
             # Production mode: Load both models
-            logger.info("Loading Stage 1: Phi-3-mini-128k...")
-            stage1_tokenizer = AutoTokenizer.from_pretrained(
-                STAGE1_MODEL,
-                trust_remote_code=True
-            )
-            stage1_model = AutoModelForCausalLM.from_pretrained(
-                STAGE1_MODEL,
-                torch_dtype=torch.float32,
-                trust_remote_code=True,
-                device_map="cpu"
-            )
-            stage1_pipeline = pipeline(
-                "text-generation",
-                model=stage1_model,
-                tokenizer=stage1_tokenizer
-                # Don't specify device when using device_map
-            )
-            logger.info("✓ Stage 1 model loaded (~10GB RAM)")
-
-            logger.info("Loading Stage 2: Phi-3-medium-128k...")
-            stage2_tokenizer = AutoTokenizer.from_pretrained(
-                STAGE2_MODEL,
-                trust_remote_code=True
-            )
-            stage2_model = AutoModelForCausalLM.from_pretrained(
-                STAGE2_MODEL,
-                torch_dtype=torch.float32,
-                trust_remote_code=True,
-                device_map="cpu"
-            )
-            stage2_pipeline = pipeline(
-                "text-generation",
-                model=stage2_model,
-                tokenizer=stage2_tokenizer
-                # Don't specify device when using device_map
-            )
-            logger.info("✓ Stage 2 model loaded (~28GB RAM)")
-            logger.info("✓ Both models loaded successfully (~38GB total RAM)")
+            if STAGE1_MODE != "rules":
+                load_stage1_model(app.state.stage1)
+            if STAGE2_MODE == "llm":
+                load_stage2_model(app.state.stage2)
+            logger.info("✓ Models loaded successfully")
         else:
             # Testing mode: Models loaded on-demand
             logger.info("⚠ Models will be loaded on-demand (testing mode)")
@@ -123,6 +190,15 @@ app = FastAPI(
 
 # ==================== Request/Response Models ====================
 
+class PaperMetadata(BaseModel):
+    """Optional paper metadata sent by the worker"""
+    model_config = ConfigDict(extra="allow")
+
+    title: Optional[str] = None
+    authors: Optional[str] = None
+    pages: Optional[int] = None
+
+
 class ProcessRequest(BaseModel):
     """Request model for text processing"""
     text: str = Field(
@@ -131,8 +207,8 @@ class ProcessRequest(BaseModel):
         max_length=MAX_TEXT_LENGTH,
         description="Text to process"
     )
-    metadata: dict = Field(
-        default_factory=dict,
+    metadata: PaperMetadata = Field(
+        default_factory=PaperMetadata,
         description="Optional metadata (title, authors, etc.)"
     )
     skip_stage1: bool = Field(
@@ -175,82 +251,796 @@ class HealthResponse(BaseModel):
     device: str = Field(..., description="Device being used")
 
 
+# ==================== Result Cache ====================
+
+# (text digest, skip_stage1, skip_stage2) -> /process response, and
+# text digest -> Stage 1 output (so re-running only Stage 2 is free),
+# both in least-recently-used order
+result_cache: "OrderedDict[tuple, ProcessResponse]" = OrderedDict()
+stage1_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def text_digest(text: str) -> str:
+    """BLAKE2b digest of the request text, used as the cache key"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=32).hexdigest()
+
+
+def cache_get(cache: OrderedDict, key):
+    """Return a cached value and mark it as recently used"""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def cache_put(cache: OrderedDict, key, value):
+    """Store a value, evicting the least recently used entry when full"""
+    if RESULT_CACHE_SIZE <= 0:
+        return
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > RESULT_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
 # ==================== Helper Functions ====================
 
-def load_stage1_model():
-    """Load Stage 1 model on-demand"""
-    global stage1_model, stage1_tokenizer, stage1_pipeline
+def cpu_supports_bf16() -> bool:
+    """Check whether the CPU has native BF16 matmul (AVX512_BF16 or AMX)"""
+    for probe in ("_is_amx_tile_supported", "_is_avx512_bf16_supported"):
+        check = getattr(torch.cpu, probe, None)
+        try:
+            if check is not None and check():
+                return True
+        except Exception:
+            continue
+    return False
+
+
+def select_dtype() -> torch.dtype:
+    """
+    Pick the weight dtype for the models
+
+    INT8 dynamic quantization operates on FP32 weights, so FP32 is kept in
+    that case. Otherwise BF16 is used on CPUs with native BF16 support (half
+    the weight bandwidth of FP32, AMX tiles on Sapphire Rapids and later);
+    older CPUs emulate BF16 and are faster in FP32.
+    """
+    if QUANTIZE == "int8":
+        return torch.float32
+
+    if TORCH_DTYPE != "auto":
+        return getattr(torch, TORCH_DTYPE)
+
+    return torch.bfloat16 if cpu_supports_bf16() else torch.float32
+
+
+def optimize_with_ipex(model, dtype: torch.dtype):
+    """
+    Apply Intel Extension for PyTorch LLM optimizations
+
+    Fuses RoPE/attention and routes BF16 matmuls to AMX kernels. Falls back
+    to the plain model if IPEX is not installed or does not support it.
+    """
+    try:
+        import intel_extension_for_pytorch as ipex  # Optional dependency, only needed for USE_IPEX
+
+        optimized = ipex.llm.optimize(model.eval(), dtype=dtype)
+        logger.info("✓ Applied IPEX LLM optimizations")
+        return optimized
+    except Exception as e:
+        logger.warning(f"IPEX optimization unavailable, using stock PyTorch: {e}")
+        return model
+
+
+def compile_model(model, tokenizer):
+    """
+    Compile the model's forward pass with torch.compile and warm it up
+
+    Removes per-op Python dispatch from every decode step. Compilation
+    happens on the first call, so a short forward pass is run at load time
+    rather than on the first request. Falls back to eager mode if
+    compilation fails.
+    """
+    eager_forward = model.forward
+    try:
+        model.forward = torch.compile(
+            eager_forward,
+            mode=TORCH_COMPILE_MODE,
+            dynamic=True,
+            fullgraph=False
+        )
+        warmup_inputs = tokenizer("Warm up the compiled model.", return_tensors="pt")
+        with torch.inference_mode():
+            model(**warmup_inputs)
+        logger.info(f"✓ Compiled model forward (mode={TORCH_COMPILE_MODE})")
+    except Exception as e:
+        model.forward = eager_forward
+        logger.warning(f"torch.compile failed, using eager mode: {e}")
+    return model
+
+
+def quantize_model(fp32_model):
+    """
+    Apply INT8 dynamic quantization to the model's Linear layers
+
+    CPU decoding is bound by reading the weights for every generated token,
+    so storing Linear weights as int8 cuts memory traffic ~4x. Falls back to
+    the unquantized model if the quantized kernels are unavailable.
+    """
+    try:
+        quantized = torch.ao.quantization.quantize_dynamic(
+            fp32_model,
+            {torch.nn.Linear},
+            dtype=torch.qint8
+        )
+        logger.info("✓ Applied INT8 dynamic quantization")
+        return quantized
+    except Exception as e:
+        logger.warning(f"INT8 quantization failed, using FP32 weights: {e}")
+        return fp32_model
+
+
+def load_model(model_name: str):
+    """
+    Load a tokenizer, model and text-generation pipeline
+
+    Returns:
+        Tuple of (model, tokenizer, pipeline)
+    """
+    dtype = select_dtype()
+    logger.info(f"Loading {model_name} in {dtype}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+    # Batched generation needs left padding so every prompt ends at the
+    # same position and new tokens are appended directly after it
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    # low_cpu_mem_usage loads weights straight from the (memory-mapped)
+    # safetensors checkpoint instead of first allocating a randomly
+    # initialized copy of the model
+    load_kwargs = {
+        "torch_dtype": dtype,
+        "trust_remote_code": True,
+        "low_cpu_mem_usage": True,
+    }
+    if MAX_CPU_MEMORY:
+        load_kwargs.update(
+            device_map="auto",
+            max_memory={"cpu": MAX_CPU_MEMORY},
+            offload_folder=OFFLOAD_FOLDER,
+            offload_state_dict=True
+        )
+    else:
+        load_kwargs["device_map"] = "cpu"
+
+    try:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name, attn_implementation=ATTN_IMPLEMENTATION, **load_kwargs
+        )
+    except ValueError as e:
+        # Raised when the (remote code) model class has no SDPA attention
+        logger.warning(f"⚠ {ATTN_IMPLEMENTATION} attention unavailable, using eager: {e}")
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name, attn_implementation="eager", **load_kwargs
+        )
+
+    model.generation_config.use_cache = True
+    if KV_CACHE == "static":
+        if getattr(model, "_supports_static_cache", False):
+            # generate() allocates the cache once at full length and resets
+            # it between calls instead of growing it every decoded token
+            model.generation_config.cache_implementation = "static"
+        else:
+            logger.warning("⚠ Static KV cache not supported for this model, using dynamic cache")
+
+    if QUANTIZE == "int8" and MAX_CPU_MEMORY:
+        # Offloaded layers live on disk, which dynamic quantization can't rewrite
+        logger.warning("INT8 quantization is not applied to disk-offloaded models")
+    elif QUANTIZE == "int8":
+        model = quantize_model(model)
+    elif USE_IPEX:
+        model = optimize_with_ipex(model, dtype)
+
+    if TORCH_COMPILE:
+        model = compile_model(model, tokenizer)
+
+    text_pipeline = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    return model, tokenizer, text_pipeline
+
+
+def load_llama_model(model_path: str):
+    """
+    Load a GGUF model with llama.cpp
+
+    4-bit GGUF decoding in llama.cpp is much faster on CPU than the
+    transformers pipeline and needs a fraction of the RAM. With
+    LLAMA_PROMPT_CACHE_MB set, evaluated states are kept in a RAM cache keyed
+    by token prefix, so each generation only prefills what follows the
+    longest cached prefix (the system prompt at least).
+    """
+    # Optional dependency, only needed for BACKEND=llama_cpp
+    from llama_cpp import Llama, LlamaRAMCache
+
+    llama = Llama(
+        model_path=model_path,
+        n_ctx=LLAMA_N_CTX,
+        n_threads=NUM_THREADS,
+        n_batch=LLAMA_N_BATCH,
+        verbose=False
+    )
+    if LLAMA_PROMPT_CACHE_MB > 0:
+        llama.set_cache(LlamaRAMCache(capacity_bytes=LLAMA_PROMPT_CACHE_MB << 20))
+    return llama
+
+
+# llm mode: characters the Greek letter / symbol rule categories act on
+GREEK_CHARS = frozenset("αβγδμΔ")
+SYMBOL_CHARS = frozenset("°±×≥≤=%")
+
 
-    if stage1_pipeline is not None:
+def stage1_system_prompt(text: Optional[str] = None) -> str:
+    """
+    System prompt for Stage 1 in the configured STAGE1_MODE
+
+    In llm mode, rule categories with nothing to act on in text (no
+    citations, Greek letters, symbols, figure references or LaTeX) are
+    left out of the prompt, so fewer prompt tokens are prefilled.
+    """
+    if STAGE1_MODE != "llm":
+        return STAGE1_RESIDUAL_PROMPT
+    if text is None:
+        return STAGE1_CLEANUP_PROMPT
+
+    skipped = set()
+    if not (
+        rule_cleanup.BRACKET_CITATION.search(text)
+        or rule_cleanup.PAREN_CITATION.search(text)
+        or rule_cleanup.ET_AL.search(text)
+        or rule_cleanup.IBID.search(text)
+    ):
+        skipped.add(CITATION_RULES)
+    if GREEK_CHARS.isdisjoint(text):
+        skipped.add(GREEK_RULES)
+    if SYMBOL_CHARS.isdisjoint(text):
+        skipped.add(SYMBOL_RULES)
+    if not rule_cleanup.BARE_FIGURE.search(text):
+        skipped.add(FIGURE_RULES)
+    if "\\" not in text and "$" not in text:
+        skipped.add(LATEX_RULES)
+
+    if not skipped:
+        return STAGE1_CLEANUP_PROMPT
+    return compose_stage1_prompt([rule for rule in STAGE1_RULES if rule not in skipped])
+
+
+def build_prompt_cache(model, tokenizer, system_prompt: str):
+    """
+    Prefill a stage's system prompt once and keep its KV cache
+
+    The system prompts are several kilobytes and identical for every
+    request, so their attention keys/values are computed at load time and
+    reused instead of being prefilled again per request.
+
+    Returns:
+        Tuple of (prefix token ids, past_key_values), or None on failure
+    """
+    if getattr(model.generation_config, "cache_implementation", None) == "static":
+        # A copied dynamic prefix can't be passed into a static cache
+        logger.info("Static KV cache in use, system prompt is prefilled per request")
+        return None
+
+    try:
+        prefix = tokenizer.apply_chat_template(
+            [{"role": "system", "content": system_prompt}],
+            tokenize=False
+        )
+        prefix_ids = tokenizer(prefix, return_tensors="pt", add_special_tokens=False).input_ids
+        with torch.inference_mode():
+            past_key_values = model(prefix_ids, use_cache=True).past_key_values
+        logger.info(f"✓ Cached system prompt ({prefix_ids.shape[1]} tokens)")
+        return prefix_ids[0], past_key_values
+    except Exception as e:
+        logger.warning(f"Could not cache system prompt, prefilling per request: {e}")
+        return None
+
+
+def stage_prompt_cache(stage: StageHandle, system_prompt: str):
+    """
+    KV cache for one of a stage's system prompts, prefilled on first use
+
+    Up to PROMPT_CACHE_SIZE prompt variants are kept per stage.
+
+    Returns:
+        (prefix token ids, past_key_values), or None
+    """
+    if stage.model is None:
+        return None
+
+    if system_prompt in stage.prompt_caches:
+        stage.prompt_caches.move_to_end(system_prompt)
+        return stage.prompt_caches[system_prompt]
+
+    prompt_cache = build_prompt_cache(stage.model, stage.tokenizer, system_prompt)
+    if PROMPT_CACHE_SIZE > 0:
+        stage.prompt_caches[system_prompt] = prompt_cache
+        while len(stage.prompt_caches) > PROMPT_CACHE_SIZE:
+            stage.prompt_caches.popitem(last=False)
+    return prompt_cache
+
+
+def load_stage1_model(stage: StageHandle):
+    """Load Stage 1 model on-demand"""
+    if stage.loaded():
         logger.info("Stage 1 model already loaded")
         return
 
-    logger.info("Loading Stage 1 model...")
-    stage1_tokenizer = AutoTokenizer.from_pretrained(STAGE1_MODEL, trust_remote_code=True)
-    stage1_model = AutoModelForCausalLM.from_pretrained(
-        STAGE1_MODEL,
-        torch_dtype=torch.float32,
-        trust_remote_code=True,
-        device_map="cpu"
-    )
-    stage1_pipeline = pipeline("text-generation", model=stage1_model, tokenizer=stage1_tokenizer)
+    if BACKEND == "llama_cpp":
+        logger.info(f"Loading Stage 1 GGUF model: {STAGE1_GGUF}...")
+        stage.llama = load_llama_model(STAGE1_GGUF)
+    else:
+        logger.info(f"Loading Stage 1 model: {STAGE1_MODEL}...")
+        stage.model, stage.tokenizer, stage.pipeline = load_model(STAGE1_MODEL)
+        stage_prompt_cache(stage, stage1_system_prompt())
     logger.info("✓ Stage 1 model loaded")
 
 
-def load_stage2_model():
+def load_stage2_model(stage: StageHandle):
     """Load Stage 2 model on-demand"""
-    global stage2_model, stage2_tokenizer, stage2_pipeline
-
-    if stage2_pipeline is not None:
+    if stage.loaded():
         logger.info("Stage 2 model already loaded")
         return
 
-    logger.info("Loading Stage 2 model...")
-    stage2_tokenizer = AutoTokenizer.from_pretrained(STAGE2_MODEL, trust_remote_code=True)
-    stage2_model = AutoModelForCausalLM.from_pretrained(
-        STAGE2_MODEL,
-        torch_dtype=torch.float32,
-        trust_remote_code=True,
-        device_map="cpu"
-    )
-    stage2_pipeline = pipeline("text-generation", model=stage2_model, tokenizer=stage2_tokenizer)
+    if BACKEND == "llama_cpp":
+        logger.info(f"Loading Stage 2 GGUF model: {STAGE2_GGUF}...")
+        stage.llama = load_llama_model(STAGE2_GGUF)
+    else:
+        logger.info(f"Loading Stage 2 model: {STAGE2_MODEL}...")
+        stage.model, stage.tokenizer, stage.pipeline = load_model(STAGE2_MODEL)
+        stage_prompt_cache(stage, STAGE2_REORGANIZATION_PROMPT)
     logger.info("✓ Stage 2 model loaded")
 
 
-def unload_stage1_model():
-    """Unload Stage 1 model to free RAM"""
-    global stage1_model, stage1_tokenizer, stage1_pipeline
+def max_new_tokens_for(input_tokens: int) -> int:
+    """
+    Generation budget for a stage, proportional to its input
+
+    Neither stage should grow the text (Stage 1 removes content, Stage 2
+    reorders it), so 1.2x the input plus some slack is plenty; the hard cap
+    bounds worst-case latency when a model fails to emit EOS.
+    """
+    return min(int(input_tokens * 1.2) + 512, MAX_NEW_TOKENS_CAP)
+
+
+def chunk_text(text: str, tokenizer=None, target_tokens: int = STAGE1_CHUNK_TOKENS) -> list[str]:
+    """
+    Split text into chunks of about target_tokens at paragraph boundaries
+
+    Paragraphs are packed greedily in order; a paragraph longer than
+    target_tokens becomes its own chunk. Without a tokenizer (llama.cpp
+    backend) token counts are estimated at 4 characters per token.
+
+    Args:
+        text: Text to split
+        tokenizer: HF tokenizer used to count tokens, or None to estimate
+        target_tokens: Approximate maximum tokens per chunk
+
+    Returns:
+        List of chunks, in order
+    """
+    paragraphs = [p for p in text.split("\n\n") if p.strip()]
+    if not paragraphs:
+        return [text]
+
+    if tokenizer is not None:
+        lengths = [len(ids) for ids in tokenizer(paragraphs, add_special_tokens=False).input_ids]
+    else:
+        lengths = [len(p) // 4 + 1 for p in paragraphs]
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph, length in zip(paragraphs, lengths):
+        if current and current_tokens + length > target_tokens:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(paragraph)
+        current_tokens += length
+    chunks.append("\n\n".join(current))
+
+    return chunks
+
+
+def generate_with_prompt_cache(
+    model,
+    tokenizer,
+    prompt: str,
+    prompt_cache,
+    max_new_tokens: int,
+    temperature: float
+) -> Optional[str]:
+    """
+    Generate from a prompt, reusing the cached system prompt KV state
+
+    Returns:
+        Generated text, stripped, or None if the prompt does not start with
+        the cached prefix (the caller then falls back to the pipeline)
+    """
+    prefix_ids, past_key_values = prompt_cache
+    input_ids = tokenizer(prompt, return_tensors="pt", add_special_tokens=False).input_ids
+    prefix_length = len(prefix_ids)
+
+    if input_ids.shape[1] <= prefix_length or not torch.equal(input_ids[0, :prefix_length], prefix_ids):
+        return None
+
+    with torch.inference_mode():
+        output_ids = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=copy.deepcopy(past_key_values),
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            do_sample=True,
+            use_cache=True,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id
+        )
+
+    return tokenizer.decode(output_ids[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
+
+
+def generate_with_assistant(
+    model,
+    tokenizer,
+    prompt: str,
+    assistant_model,
+    max_new_tokens: int,
+    temperature: float
+) -> str:
+    """
+    Generate from a prompt with speculative (assisted) decoding
+
+    The assistant proposes NUM_ASSISTANT_TOKENS tokens at a time and the
+    model verifies them in a single forward pass, keeping the accepted
+    prefix. Both models must share a vocabulary.
+
+    Returns:
+        Generated text, stripped
+    """
+    assistant_model.generation_config.num_assistant_tokens = NUM_ASSISTANT_TOKENS
+    input_ids = tokenizer(prompt, return_tensors="pt", add_special_tokens=False).input_ids
+
+    with torch.inference_mode():
+        output_ids = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            assistant_model=assistant_model,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            do_sample=True,
+            use_cache=True,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id
+        )
+
+    return tokenizer.decode(output_ids[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
+
+
+def run_stage(
+    text_pipeline,
+    tokenizer,
+    llama,
+    system_prompt: str,
+    user_contents: list[str],
+    temperature: float,
+    prompt_cache=None,
+    assistant_model=None
+) -> list[str]:
+    """
+    Run chat-formatted generations on whichever backend is loaded
+
+    Each user message gets its own conversation with the same system
+    prompt, always placed first so every backend can reuse its prefix. On
+    the transformers backend they are generated in batches of
+    STAGE1_BATCH_SIZE through one pipeline call; llama.cpp runs them in
+    turn. A single message is generated directly on the model,
+    speculatively when an assistant model is given, otherwise with the
+    cached system prompt KV state when one is available.
+
+    Args:
+        text_pipeline: transformers pipeline (transformers backend)
+        tokenizer: Tokenizer used for the chat template (transformers backend)
+        llama: llama_cpp.Llama instance (llama_cpp backend)
+        system_prompt: System message
+        user_contents: User messages, one generation each
+        temperature: Sampling temperature
+        prompt_cache: (prefix ids, past_key_values) from build_prompt_cache
+        assistant_model: Draft model sharing tokenizer's vocabulary
+
+    Returns:
+        Generated texts, stripped, in the order of user_contents
+    """
+    conversations = [
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        for user_content in user_contents
+    ]
+
+    if llama is not None:
+        outputs = []
+        for user_content, messages in zip(user_contents, conversations):
+            input_tokens = len(llama.tokenize(user_content.encode("utf-8"), add_bos=False))
+            result = llama.create_chat_completion(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_new_tokens_for(input_tokens)
+            )
+            outputs.append(result["choices"][0]["message"]["content"].strip())
+        return outputs
+
+    prompts = [
+        tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        for messages in conversations
+    ]
+
+    input_tokens = max(len(ids) for ids in tokenizer(user_contents, add_special_tokens=False).input_ids)
+
+    if assistant_model is not None and len(prompts) == 1:
+        return [generate_with_assistant(
+            text_pipeline.model,
+            tokenizer,
+            prompts[0],
+            assistant_model,
+            max_new_tokens=max_new_tokens_for(input_tokens),
+            temperature=temperature
+        )]
+
+    if prompt_cache is not None and len(prompts) == 1:
+        output = generate_with_prompt_cache(
+            text_pipeline.model,
+            tokenizer,
+            prompts[0],
+            prompt_cache,
+            max_new_tokens=max_new_tokens_for(input_tokens),
+            temperature=temperature
+        )
+        if output is not None:
+            return [output]
+
+    results = text_pipeline(
+        prompts,
+        batch_size=min(len(prompts), STAGE1_BATCH_SIZE),
+        max_new_tokens=max_new_tokens_for(input_tokens),
+        temperature=temperature,
+        do_sample=True,
+        return_full_text=False,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id
+    )
+    return [result[0]['generated_text'].strip() for result in results]
+
+
+def check_stages_loaded(request: ProcessRequest):
+    """Raise 503 if a model needed by the requested stages is not loaded"""
+    if not request.skip_stage1 and STAGE1_MODE != "rules" and not app.state.stage1.loaded():
+        if not LOAD_BOTH_MODELS:
+            raise HTTPException(
+                status_code=503,
+                detail="Stage 1 model not loaded. Call /load-stage1 first."
+            )
+        else:
+            raise HTTPException(
+                status_code=503,
+                detail="Stage 1 model failed to load on startup"
+            )
+
+    if not request.skip_stage2 and STAGE2_MODE == "llm" and not app.state.stage2.loaded():
+        if not LOAD_BOTH_MODELS:
+            raise HTTPException(
+                status_code=503,
+                detail="Stage 2 model not loaded. Call /load-stage2 first."
+            )
+        else:
+            raise HTTPException(
+                status_code=503,
+                detail="Stage 2 model failed to load on startup"
+            )
+
+
+def run_stage1(stage: StageHandle, text: str):
+    """
+    Run Stage 1 cleanup, yielding cleaned chunks one batch at a time
+
+    Deterministic substitutions (citations, symbols, LaTeX, ...) are done
+    with precompiled regexes instead of spending LLM tokens. Stage 1 rules
+    are local to each sentence, so the LLM cleans the paper in
+    paragraph-aligned chunks generated STAGE1_BATCH_SIZE at a time. The
+    model objects are read once, so a reload mid-request doesn't mix models.
+
+    Yields:
+        Lists of cleaned chunks, in document order
+    """
+    if STAGE1_MODE != "llm":
+        text = rule_cleanup.apply(text)
+
+    if STAGE1_MODE == "rules":
+        yield [text]
+        return
+
+    text_pipeline, tokenizer, llama = stage.pipeline, stage.tokenizer, stage.llama
+    system_prompt = stage1_system_prompt(text)
+    prompt_cache = stage_prompt_cache(stage, system_prompt)
+    chunks = chunk_text(text, tokenizer)
+    logger.info(f"Stage 1: {len(chunks)} chunks")
+
+    for batch_start in range(0, len(chunks), STAGE1_BATCH_SIZE):
+        yield run_stage(
+            text_pipeline,
+            tokenizer,
+            llama,
+            system_prompt,
+            [
+                f"Clean this scientific paper text for TTS:\n\n{chunk}"
+                for chunk in chunks[batch_start:batch_start + STAGE1_BATCH_SIZE]
+            ],
+            temperature=0.2,  # Low for deterministic cleanup
+            prompt_cache=prompt_cache
+        )
+
+
+def stage2_draft_model(stage1: StageHandle, stage2: StageHandle):
+    """
+    Stage 1 model to use as the Stage 2 draft, or None
+
+    Only used when SPECULATIVE_DECODING is on, both transformers models are
+    loaded and they share a vocabulary (Phi-3-mini and Phi-3-medium do).
+    """
+    if not SPECULATIVE_DECODING or stage1.model is None or stage2.model is None:
+        return None
+    if stage1.tokenizer.get_vocab() != stage2.tokenizer.get_vocab():
+        return None
+    return stage1.model
+
+
+def run_stage2(stage: StageHandle, text: str, draft_model=None) -> str:
+    """Run Stage 2 section reorganization on the full Stage 1 output"""
+    if STAGE2_MODE != "llm":
+        # Header detection against a fixed vocabulary and reordering is
+        # deterministic, so no model is needed
+        return section_detect.reorganize(text)
+
+    # Stage 2 reorders sections globally, so it sees the whole text
+    return run_stage(
+        stage.pipeline,
+        stage.tokenizer,
+        stage.llama,
+        STAGE2_REORGANIZATION_PROMPT,
+        [f"Reorganize this cleaned scientific paper text for TTS listening:\n\n{text}"],
+        temperature=0.3,  # Slightly higher for creative reorganization
+        prompt_cache=stage_prompt_cache(stage, STAGE2_REORGANIZATION_PROMPT),
+        assistant_model=draft_model
+    )[0]
+
+
+async def stage1_batches(stage: StageHandle, text: str):
+    """
+    Run Stage 1 in a worker thread, yielding each batch of cleaned chunks
+
+    The stage lock is held per batch, so concurrent requests take turns on
+    the model without blocking the event loop.
+    """
+    batches = run_stage1(stage, text)
+    while True:
+        async with stage.lock:
+            batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            return
+        yield batch
+
 
-    if stage1_pipeline is None:
+async def stage2_reorganize(stage: StageHandle, text: str) -> str:
+    """
+    Run Stage 2 in a worker thread while holding the stage lock
+
+    When the Stage 1 model drafts for Stage 2, its lock is held as well
+    (always taken before the Stage 2 lock).
+    """
+    draft_stage = app.state.stage1
+    draft_model = stage2_draft_model(draft_stage, stage) if STAGE2_MODE == "llm" else None
+    if draft_model is None:
+        async with stage.lock:
+            return await asyncio.to_thread(run_stage2, stage, text)
+
+    async with draft_stage.lock, stage.lock:
+        return await asyncio.to_thread(run_stage2, stage, text, draft_model)
+
+
+def sse_event(data: dict) -> str:
+    """Format a dict as a Server-Sent Events data message"""
+    return f"data: {json.dumps(data)}\n\n"
+
+
+async def stream_process(request: ProcessRequest):
+    """
+    Run both stages, yielding SSE events as output becomes available
+
+    Stage 2 reorders sections across the whole paper, so it starts once
+    Stage 1 is complete; Stage 1 chunks are relayed as each batch finishes
+    so clients can start consuming cleaned text early.
+    """
+    start_time = time.time()
+    stage1_time = None
+    stage2_time = None
+
+    try:
+        digest = text_digest(request.text)
+        stage1_output = None if request.skip_stage1 else cache_get(stage1_cache, digest)
+        if stage1_output is not None:
+            logger.info("✓ Stage 1 cache hit")
+            yield sse_event({"stage": 1, "chunk": 0, "text": stage1_output})
+        elif not request.skip_stage1:
+            stage1_start = time.time()
+            cleaned_chunks = []
+            async for batch in stage1_batches(app.state.stage1, request.text):
+                for cleaned in batch:
+                    yield sse_event({"stage": 1, "chunk": len(cleaned_chunks), "text": cleaned})
+                    cleaned_chunks.append(cleaned)
+            stage1_output = "\n\n".join(cleaned_chunks)
+            stage1_time = time.time() - stage1_start
+            cache_put(stage1_cache, digest, stage1_output)
+            logger.info(f"✓ Stage 1 complete: {len(stage1_output)} chars in {stage1_time:.2f}s")
+        else:
+            stage1_output = request.text
+
+        final_output = stage1_output
+        if not request.skip_stage2:
+            stage2_start = time.time()
+            final_output = await stage2_reorganize(app.state.stage2, stage1_output)
+            stage2_time = time.time() - stage2_start
+            logger.info(f"✓ Stage 2 complete: {len(final_output)} chars in {stage2_time:.2f}s")
+            yield sse_event({"stage": 2, "text": final_output})
+    except Exception as e:
+        logger.error(f"Streaming processing failed: {e}", exc_info=True)
+        yield sse_event({"error": f"Text processing failed: {e}"})
+        return
+
+    total_time = time.time() - start_time
+    logger.info(f"✓ Streaming processing complete in {total_time:.2f}s")
+    yield sse_event({
+        "done": True,
+        "original_length": len(request.text),
+        "final_length": len(final_output),
+        "processing_time_seconds": round(total_time, 2),
+        "stage1_time": round(stage1_time, 2) if stage1_time else None,
+        "stage2_time": round(stage2_time, 2) if stage2_time else None
+    })
+
+
+def unload_stage1_model(stage: StageHandle):
+    """Unload Stage 1 model to free RAM"""
+    if not stage.loaded():
         logger.info("Stage 1 model not loaded")
         return
 
     logger.info("Unloading Stage 1 model...")
-    del stage1_model
-    del stage1_tokenizer
-    del stage1_pipeline
-    stage1_model = None
-    stage1_tokenizer = None
-    stage1_pipeline = None
+    stage.clear()
     torch.cuda.empty_cache() if torch.cuda.is_available() else None
     logger.info("✓ Stage 1 model unloaded")
 
 
-def unload_stage2_model():
+def unload_stage2_model(stage: StageHandle):
     """Unload Stage 2 model to free RAM"""
-    global stage2_model, stage2_tokenizer, stage2_pipeline
-
-    if stage2_pipeline is None:
+    if not stage.loaded():
         logger.info("Stage 2 model not loaded")
         return
 
     logger.info("Unloading Stage 2 model...")
-    del stage2_model
-    del stage2_tokenizer
-    del stage2_pipeline
-    stage2_model = None
-    stage2_tokenizer = None
-    stage2_pipeline = None
+    stage.clear()
     torch.cuda.empty_cache() if torch.cuda.is_available() else None
     logger.info("✓ Stage 2 model unloaded")
 
@@ -269,6 +1059,7 @@ async def root():
         "endpoints": {
             "health": "GET /health",
             "process": "POST /process",
+            "process_stream": "POST /process/stream",
             "load_stage1": "POST /load-stage1",
             "load_stage2": "POST /load-stage2",
             "unload_stage1": "POST /unload-stage1",
@@ -282,8 +1073,8 @@ async def health_check():
     """Health check endpoint"""
     return HealthResponse(
         status="healthy",
-        stage1_loaded=stage1_pipeline is not None,
-        stage2_loaded=stage2_pipeline is not None,
+        stage1_loaded=app.state.stage1.loaded(),
+        stage2_loaded=app.state.stage2.loaded(),
         stage1_model=STAGE1_MODEL,
         stage2_model=STAGE2_MODEL,
         device=DEVICE
@@ -294,7 +1085,8 @@ async def health_check():
 async def load_stage1():
     """Load Stage 1 model (for testing)"""
     try:
-        load_stage1_model()
+        async with app.state.stage1.lock:
+            await asyncio.to_thread(load_stage1_model, app.state.stage1)
         return {"success": True, "message": "Stage 1 model loaded"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -304,7 +1096,8 @@ async def load_stage1():
 async def load_stage2():
     """Load Stage 2 model (for testing)"""
     try:
-        load_stage2_model()
+        async with app.state.stage2.lock:
+            await asyncio.to_thread(load_stage2_model, app.state.stage2)
         return {"success": True, "message": "Stage 2 model loaded"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -314,7 +1107,8 @@ async def load_stage2():
 async def unload_stage1():
     """Unload Stage 1 model (for testing)"""
     try:
-        unload_stage1_model()
+        async with app.state.stage1.lock:
+            await asyncio.to_thread(unload_stage1_model, app.state.stage1)
         return {"success": True, "message": "Stage 1 model unloaded"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -324,7 +1118,8 @@ async def unload_stage1():
 async def unload_stage2():
     """Unload Stage 2 model (for testing)"""
     try:
-        unload_stage2_model()
+        async with app.state.stage2.lock:
+            await asyncio.to_thread(unload_stage2_model, app.state.stage2)
         return {"success": True, "message": "Stage 2 model unloaded"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -343,122 +1138,82 @@ async def process_text(request: ProcessRequest):
 
     logger.info(f"Processing {original_length} chars of text...")
 
+    digest = text_digest(request.text)
+    cache_key = (digest, request.skip_stage1, request.skip_stage2)
+    cached = cache_get(result_cache, cache_key)
+    if cached is not None:
+        logger.info("✓ Result cache hit")
+        return cached
+
+    # Outputs stay None for skipped stages; final_output/final_length track
+    # the last stage that ran, so each output's length is computed once
     stage1_output = None
     stage2_output = None
     stage1_time = None
     stage2_time = None
+    final_output = request.text
+    final_length = original_length
+
+    check_stages_loaded(request)
 
     try:
         # Stage 1: Local cleanup
         if not request.skip_stage1:
-            if stage1_pipeline is None:
-                if not LOAD_BOTH_MODELS:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Stage 1 model not loaded. Call /load-stage1 first."
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Stage 1 model failed to load on startup"
-                    )
-
-            logger.info(f"Stage 1: Cleaning {original_length} chars...")
-            stage1_start = time.time()
-
-            stage1_messages = [
-                {"role": "system", "content": STAGE1_CLEANUP_PROMPT},
-                {"role": "user", "content": f"Clean this scientific paper text for TTS:\n\n{request.text}"}
-            ]
-
-            stage1_prompt = stage1_tokenizer.apply_chat_template(
-                stage1_messages,
-                tokenize=False,
-                add_generation_prompt=True
-            )
-
-            stage1_result = stage1_pipeline(
-                stage1_prompt,
-                max_new_tokens=150000,  # Large enough for full papers
-                temperature=0.2,  # Low for deterministic cleanup
-                do_sample=True,
-                return_full_text=False,
-                pad_token_id=stage1_tokenizer.eos_token_id
-            )
-
-            stage1_output = stage1_result[0]['generated_text'].strip()
-            stage1_time = time.time() - stage1_start
-
-            logger.info(f"✓ Stage 1 complete: {len(stage1_output)} chars in {stage1_time:.2f}s")
+            stage1_output = cache_get(stage1_cache, digest)
+            if stage1_output is not None:
+                logger.info("✓ Stage 1 cache hit")
+            else:
+                logger.info(f"Stage 1 ({STAGE1_MODE}): Cleaning {original_length} chars...")
+                stage1_start = time.time()
+
+                stage1_output = "\n\n".join([
+                    cleaned async for batch in stage1_batches(app.state.stage1, request.text) for cleaned in batch
+                ])
+                stage1_time = time.time() - stage1_start
+                cache_put(stage1_cache, digest, stage1_output)
+
+            final_output, final_length = stage1_output, len(stage1_output)
+            if stage1_time is not None:
+                logger.info(f"✓ Stage 1 complete: {final_length} chars in {stage1_time:.2f}s")
         else:
             logger.info("⊘ Stage 1 skipped")
-            stage1_output = request.text
 
         # Stage 2: Section reorganization
         if not request.skip_stage2:
-            if stage2_pipeline is None:
-                if not LOAD_BOTH_MODELS:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Stage 2 model not loaded. Call /load-stage2 first."
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Stage 2 model failed to load on startup"
-                    )
-
-            logger.info(f"Stage 2: Reorganizing {len(stage1_output)} chars...")
+            logger.info(f"Stage 2 ({STAGE2_MODE}): Reorganizing {final_length} chars...")
             stage2_start = time.time()
 
-            stage2_messages = [
-                {"role": "system", "content": STAGE2_REORGANIZATION_PROMPT},
-                {"role": "user", "content": f"Reorganize this cleaned scientific paper text for TTS listening:\n\n{stage1_output}"}
-            ]
-
-            stage2_prompt = stage2_tokenizer.apply_chat_template(
-                stage2_messages,
-                tokenize=False,
-                add_generation_prompt=True
-            )
-
-            stage2_result = stage2_pipeline(
-                stage2_prompt,
-                max_new_tokens=150000,
-                temperature=0.3,  # Slightly higher for creative reorganization
-                do_sample=True,
-                return_full_text=False,
-                pad_token_id=stage2_tokenizer.eos_token_id
-            )
-
-            stage2_output = stage2_result[0]['generated_text'].strip()
+            stage2_output = await stage2_reorganize(app.state.stage2, final_output)
             stage2_time = time.time() - stage2_start
 
-            logger.info(f"✓ Stage 2 complete: {len(stage2_output)} chars in {stage2_time:.2f}s")
+            # An empty reorganization falls back to the Stage 1 text
+            stage2_length = len(stage2_output)
+            if stage2_length:
+                final_output, final_length = stage2_output, stage2_length
+            logger.info(f"✓ Stage 2 complete: {stage2_length} chars in {stage2_time:.2f}s")
         else:
             logger.info("⊘ Stage 2 skipped")
-            stage2_output = stage1_output
 
-        # Final output is from last stage
-        final_output = stage2_output if stage2_output else stage1_output
         total_time = time.time() - start_time
 
         logger.info(
-            f"✓ Processing complete: {original_length} → {len(final_output)} chars "
+            f"✓ Processing complete: {original_length} → {final_length} chars "
             f"in {total_time:.2f}s"
         )
 
-        return ProcessResponse(
+        response = ProcessResponse(
             success=True,
-            stage1_output=stage1_output if not request.skip_stage1 else None,
-            stage2_output=stage2_output if not request.skip_stage2 else None,
+            stage1_output=stage1_output,
+            stage2_output=stage2_output,
             final_output=final_output,
             original_length=original_length,
-            final_length=len(final_output),
+            final_length=final_length,
             processing_time_seconds=round(total_time, 2),
             stage1_time=round(stage1_time, 2) if stage1_time else None,
             stage2_time=round(stage2_time, 2) if stage2_time else None
         )
+        cache_put(result_cache, cache_key, response)
+        return response
 
     except HTTPException:
         raise
@@ -470,6 +1225,21 @@ async def process_text(request: ProcessRequest):
         )
 
 
+@app.post("/process/stream")
+async def process_text_stream(request: ProcessRequest):
+    """
+    Two-stage text processing pipeline, streamed as Server-Sent Events
+
+    Each batch of Stage 1 chunks is sent as soon as it has been generated
+    ({"stage": 1, "chunk", "text"} events), followed by the Stage 2 output
+    ({"stage": 2, "text"}) and a final {"done": true} event with timings.
+    """
+    check_stages_loaded(request)
+
+    logger.info(f"Streaming processing of {len(request.text)} chars of text...")
+    return StreamingResponse(stream_process(request), media_type="text/event-stream")
+
+
 # ==================== Main ====================
 
 if __name__ == "__main__":
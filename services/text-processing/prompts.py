@@ -2,36 +2,38 @@
 System prompts for two-stage text processing pipeline
 """
 
-STAGE1_CLEANUP_PROMPT = """You are a scientific text preprocessor for text-to-speech (TTS) conversion. Your task is to clean and normalize scientific paper text at the LOCAL level (word-by-word, sentence-by-sentence).
+# Stage 1 (llm mode) prompt, split into one constant per rule category so
+# that categories with nothing to act on can be left out for a given text
+STAGE1_HEADER = """You are a scientific text preprocessor for text-to-speech (TTS) conversion. Your task is to clean and normalize scientific paper text at the LOCAL level (word-by-word, sentence-by-sentence).
 
-DO NOT reorganize sections or change the document structure. Focus ONLY on these local transformations:
+DO NOT reorganize sections or change the document structure. Focus ONLY on these local transformations:"""
 
-1. CITATIONS - Remove all citation formats:
+CITATION_RULES = """CITATIONS - Remove all citation formats:
    - Parenthetical: (Author, 2020), (Smith et al., 2019), (Author1 and Author2, 2021)
    - Bracketed: [1], [17], [1-3], [Smith et al.], [1,2,3]
    - Remove "et al." phrases
-   - Remove "ibid.", "op. cit." references
+   - Remove "ibid.", "op. cit." references"""
 
-2. ABBREVIATIONS - Expand for TTS readability:
+ABBREVIATION_RULES = """ABBREVIATIONS - Expand for TTS readability:
    - Common: e.g. → for example, i.e. → that is, etc. → and so forth, vs. → versus
    - Scientific: µl → microliter, mg → milligrams, kg → kilograms, ml → milliliter
    - Doses: LD₅₀ → lethal dose fifty, LD50 → lethal dose fifty, EC₅₀ → effective concentration fifty
-   - Measurements: approx. → approximately, min → minute, max → maximum, avg → average
+   - Measurements: approx. → approximately, min → minute, max → maximum, avg → average"""
 
-3. SPECIES NAMES - Expand genus on FIRST use only:
+SPECIES_RULES = """SPECIES NAMES - Expand genus on FIRST use only:
    - C. quinquefasciatus → Culex quinquefasciatus (first occurrence)
    - E. coli → Escherichia coli (first occurrence)
-   - After first use, keep abbreviated (C. quinquefasciatus, E. coli)
+   - After first use, keep abbreviated (C. quinquefasciatus, E. coli)"""
 
-4. GREEK LETTERS - Write out:
+GREEK_RULES = """GREEK LETTERS - Write out:
    - α → alpha
    - β → beta
    - γ → gamma
    - δ → delta
    - μ → mu
-   - Δ → delta
+   - Δ → delta"""
 
-5. SYMBOLS & SPECIAL CHARACTERS - Convert to words:
+SYMBOL_RULES = """SYMBOLS & SPECIAL CHARACTERS - Convert to words:
    - ° → degrees
    - °C → degrees Celsius
    - ± → plus or minus
@@ -39,49 +41,99 @@ DO NOT reorganize sections or change the document structure. Focus ONLY on these
    - ≥ → greater than or equal to
    - ≤ → less than or equal to
    - = → equals
-   - % → percent
+   - % → percent"""
 
-6. FIGURE/TABLE REFERENCES - Remove completely:
+FIGURE_RULES = """FIGURE/TABLE REFERENCES - Remove completely:
    - "Figure 1", "Fig. 2", "Figure 1A", "Figures 1-3"
    - "Table 3", "Tables 1 and 2"
    - "(see Figure X)" or "(Figure X)" parentheticals
    - "as shown in Figure X"
    - Figure captions and table captions
-   - "Supplementary Figure S1"
+   - "Supplementary Figure S1\""""
 
-7. FORMATTING ARTIFACTS - Clean up:
-   - Remove LaTeX commands: \\textbf{}, \\textit{}, $equation$, \\cite{}, etc.
+LATEX_RULES = """LATEX - Remove LaTeX markup:
+   - Commands: \\textbf{}, \\textit{}, \\cite{}, etc. (keep the text inside formatting commands)
+   - Inline and display math: $equation$, $$equation$$"""
+
+FORMATTING_RULES = """FORMATTING ARTIFACTS - Clean up:
    - Remove page numbers, headers, footers
    - Remove DOI links: "doi:", "https://doi.org/", "DOI:"
    - Remove URLs: http://, https://, www.
    - Remove email addresses: name@domain.com
    - Fix broken words from line breaks (e.g., "re-\nsults" → "results")
    - Normalize whitespace (multiple spaces → single space)
-   - Normalize quotes: convert fancy quotes to standard " or '
+   - Normalize quotes: convert fancy quotes to standard " or '"""
 
-8. HEADERS/FOOTERS - Remove:
+HEADER_FOOTER_RULES = """HEADERS/FOOTERS - Remove:
    - Page numbers at top/bottom
    - Journal names, volume/issue numbers
    - Running headers (repeated text)
    - Copyright notices
-   - Manuscript IDs
+   - Manuscript IDs"""
 
-9. AUTHOR AFFILIATIONS - Remove if mixed in body text:
+AFFILIATION_RULES = """AUTHOR AFFILIATIONS - Remove if mixed in body text:
    - Superscript markers (¹, ², *, †, ‡)
    - Department/institution addresses
    - Email addresses
-   - Correspondence markers
+   - Correspondence markers"""
 
-10. PRESERVE - Keep these exactly as-is:
-    - Section headers (Abstract, Introduction, Methods, Results, etc.)
-    - Paragraph breaks and structure
-    - Main narrative text content
-    - Original section ORDER (do not reorganize)
-    - Technical terminology and scientific names (after expansion)
-    - Numbers and numerical data
+PRESERVE_RULES = """PRESERVE - Keep these exactly as-is:
+   - Section headers (Abstract, Introduction, Methods, Results, etc.)
+   - Paragraph breaks and structure
+   - Main narrative text content
+   - Original section ORDER (do not reorganize)
+   - Technical terminology and scientific names (after expansion)
+   - Numbers and numerical data"""
 
-Return ONLY the cleaned text. Do not add any explanations, comments, or meta-text. Output the cleaned text directly."""
+STAGE1_FOOTER = """Return ONLY the cleaned text. Do not add any explanations, comments, or meta-text. Output the cleaned text directly."""
+
+# All Stage 1 rule categories, in prompt order
+STAGE1_RULES = [
+    CITATION_RULES,
+    ABBREVIATION_RULES,
+    SPECIES_RULES,
+    GREEK_RULES,
+    SYMBOL_RULES,
+    FIGURE_RULES,
+    LATEX_RULES,
+    FORMATTING_RULES,
+    HEADER_FOOTER_RULES,
+    AFFILIATION_RULES,
+    PRESERVE_RULES,
+]
+
+
+def compose_stage1_prompt(rules: list[str]) -> str:
+    """Build a Stage 1 system prompt from rule categories, numbered in order"""
+    numbered = [f"{number}. {rule}" for number, rule in enumerate(rules, start=1)]
+    return "\n\n".join([STAGE1_HEADER, *numbered, STAGE1_FOOTER])
+
+
+STAGE1_CLEANUP_PROMPT = compose_stage1_prompt(STAGE1_RULES)
+
+
+# Stage 1 prompt for hybrid mode: the deterministic rules (citations,
+# abbreviations, symbols, Greek letters, figure references, URLs, LaTeX,
+# whitespace) have already been applied by rule_cleanup.py
+STAGE1_RESIDUAL_PROMPT = """You are a scientific text preprocessor for text-to-speech (TTS) conversion. The text has already had citations, figure references, URLs, LaTeX, symbols and common abbreviations cleaned up. Make ONLY these remaining local fixes:
 
+1. SPECIES NAMES - Expand genus on FIRST use only:
+   - C. quinquefasciatus → Culex quinquefasciatus (first occurrence)
+   - E. coli → Escherichia coli (first occurrence)
+   - After first use, keep abbreviated
+
+2. HEADERS/FOOTERS - Remove:
+   - Journal names, volume/issue numbers
+   - Running headers (repeated text)
+   - Manuscript IDs
+
+3. CAPTIONS AND AFFILIATIONS - Remove:
+   - Figure and table captions
+   - Department/institution addresses and correspondence markers mixed into body text
+
+4. PRESERVE everything else exactly as-is, including section headers, paragraph breaks, section order and numbers.
+
+Return ONLY the cleaned text. Do not add any explanations, comments, or meta-text. Output the cleaned text directly."""
 
 STAGE2_REORGANIZATION_PROMPT = """You are a scientific paper restructuring assistant for text-to-speech (TTS) listening. You receive cleaned text from a scientific paper and must reorganize it into a logical narrative structure optimized for audio consumption.
 
@@ -0,0 +1,170 @@
+"""
+Rule-based Stage 1 cleanup
+Deterministic regex/translate implementation of the STAGE1_CLEANUP_PROMPT rules
+"""
+import re
+
+# 1. Citations: [1], [1-3], [1,2,3], [Smith et al.]
+BRACKET_CITATION = re.compile(r'\s*\[(?:\d+(?:\s*[,\u2013-]\s*\d+)*|[A-Z][A-Za-z]+ et al\.?)\]')
+
+# 1. Citations: (Smith, 2020), (Smith and Jones, 2019), (Smith et al., 2019; Lee, 2021);
+# only author-year shapes, so other parentheticals ending in a year are kept
+AUTHOR_YEAR = (
+    r"[A-Z][A-Za-z'-]+(?:\s+et al\.|\s+(?:and|&)\s+[A-Z][A-Za-z'-]+)?"
+    r",?\s+\d{4}[a-z]?(?:,\s*\d{4}[a-z]?)*"
+)
+PAREN_CITATION = re.compile(
+    rf'\s*\((?:see\s+)?{AUTHOR_YEAR}(?:;\s*{AUTHOR_YEAR})*\)'
+)
+
+ET_AL = re.compile(r'\s+et al\.')
+IBID = re.compile(r'\s*\b(?:ibid\.|op\. cit\.)', re.IGNORECASE)
+
+# 6. Figure/table references, including chains like "Figure 2 and Table 1"
+# or "Figs. 1, 2, and 3", so a run is removed whole with its lead-in
+FIGURE_LABEL = r'(?:Supplementary\s+)?(?:Fig(?:ure)?s?\.?|Tables?)\s*'
+FIGURE_NUMBER = r'S?\d+[A-Za-z]?'
+FIGURE_REF = (
+    rf'{FIGURE_LABEL}{FIGURE_NUMBER}'
+    rf'(?:\s*(?:,\s*(?:and|or)\b|and\b|or\b|[,\u2013-])\s*(?:{FIGURE_LABEL})?{FIGURE_NUMBER})*'
+)
+PAREN_FIGURE = re.compile(rf'\s*\((?:see\s+)?{FIGURE_REF}\)')
+INLINE_FIGURE = re.compile(rf'\s+(?:as\s+shown\s+)?in\s+{FIGURE_REF}')
+BARE_FIGURE = re.compile(rf'\b{FIGURE_REF}\b')
+
+# 7. Links, contact details and LaTeX
+# (sentence punctuation right after a link is kept)
+URL = re.compile(r'(?:https?://|www\.)\S*[^\s.,;:]|\bdoi:\s*\S*[^\s.,;:]', re.IGNORECASE)
+EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+# Inline math must not start with a digit or space or end with a space, so
+# prices like "$5 and $10" are not taken for math
+LATEX_MATH = re.compile(r'\$\$[^$]+\$\$|\$(?![\d\s])[^$]+(?<!\s)\$')
+LATEX_CITE = re.compile(r'\\(?:cite|ref|label)\{[^}]*\}')
+LATEX_COMMAND = re.compile(r'\\[a-zA-Z]+\{([^}]*)\}')
+
+# 7. Words broken across lines: "re-\nsults" -> "results"
+BROKEN_WORD = re.compile(r'(\w)-\n(\w)')
+
+# 8. Headers/footers: bare page numbers and copyright notices on their own
+# line; a notice must start the line so "(c) 2020" in a list is kept
+PAGE_NUMBER_LINE = re.compile(r'^[ \t]*\d{1,4}[ \t]*$', re.MULTILINE)
+COPYRIGHT = re.compile(
+    r'^[ \t]*(?:\u00a9|Copyright(?:[ \t]*\u00a9)?)[ \t]*\d{4}.*$',
+    re.MULTILINE | re.IGNORECASE
+)
+
+# 2. Abbreviations
+ABBREVIATIONS = {
+    'e.g.,': 'for example,',
+    'e.g.': 'for example',
+    'i.e.,': 'that is,',
+    'i.e.': 'that is',
+    'etc.': 'and so forth',
+    'vs.': 'versus',
+    'approx.': 'approximately',
+    'LD\u2085\u2080': 'lethal dose fifty',
+    'LD50': 'lethal dose fifty',
+    'EC\u2085\u2080': 'effective concentration fifty',
+    'EC50': 'effective concentration fifty',
+    '\u00b5l': 'microliter',
+    '\u03bcl': 'microliter',
+}
+ABBREVIATION = re.compile(
+    '|'.join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True))
+)
+
+# 2./5. Units and symbols that only make sense after a number: "5 mg", "10%"
+UNITS = {
+    'mg': 'milligrams',
+    'kg': 'kilograms',
+    'ml': 'milliliter',
+    'min': 'minutes',
+    '%': 'percent',
+}
+UNIT = re.compile(r'(?<=\d)\s*(mg|kg|ml|min|%)(?![A-Za-z])')
+
+EQUALS = re.compile(r'\s+=\s+')
+
+# 5. Multi-character symbols, replaced before the single-character table
+# so that "°C" is not translated as "°" + "C"
+SYMBOLS = {
+    '\u00b0C': ' degrees Celsius',
+    '\u00b0F': ' degrees Fahrenheit',
+}
+SYMBOL = re.compile('|'.join(re.escape(s) for s in SYMBOLS))
+
+# 4./5./7./9. Single-character substitutions done in one str.translate pass
+CHAR_TABLE = str.maketrans({
+    '\u03b1': 'alpha',
+    '\u03b2': 'beta',
+    '\u03b3': 'gamma',
+    '\u03b4': 'delta',
+    '\u03bc': 'mu',
+    '\u0394': 'delta',
+    '\u00b0': ' degrees',
+    '\u00b1': ' plus or minus ',
+    '\u00d7': ' times ',
+    '\u2265': ' greater than or equal to ',
+    '\u2264': ' less than or equal to ',
+    '\u201c': '"',
+    '\u201d': '"',
+    '\u2018': "'",
+    '\u2019': "'",
+    '\u00b9': None,
+    '\u00b2': None,
+    '\u00b3': None,
+    '\u2020': None,
+    '\u2021': None,
+})
+
+WHITESPACE = re.compile(r'[ \t]+')
+SPACE_BEFORE_PUNCT = re.compile(r' +([.,;:!?)\]])')
+SPACE_AFTER_BRACKET = re.compile(r'([(\[]) +')
+BLANK_LINES = re.compile(r'\n[ \t]*\n(?:[ \t]*\n)+')
+
+
+def normalize_symbols(text: str) -> str:
+    """
+    Write out Greek letters and symbols and normalize quotes
+
+    Multi-character symbols go through one compiled alternation; everything
+    else is a single str.translate pass over the string.
+    """
+    text = SYMBOL.sub(lambda m: SYMBOLS[m.group(0)], text)
+    return text.translate(CHAR_TABLE)
+
+
+def apply(text: str) -> str:
+    """
+    Apply the deterministic Stage 1 cleanup rules to text
+
+    Covers citations, figure/table references, URLs, emails, LaTeX,
+    abbreviations, units, symbols, Greek letters, page numbers and
+    formatting. Paragraph breaks are preserved. Species name expansion and
+    judgement calls (running headers, captions, affiliation blocks) are left
+    to the LLM.
+    """
+    text = BROKEN_WORD.sub(r'\1\2', text)
+    text = PAGE_NUMBER_LINE.sub('', text)
+    text = COPYRIGHT.sub('', text)
+    text = LATEX_MATH.sub('', text)
+    text = LATEX_CITE.sub('', text)
+    text = LATEX_COMMAND.sub(r'\1', text)
+    text = URL.sub('', text)
+    text = EMAIL.sub('', text)
+    text = BRACKET_CITATION.sub('', text)
+    text = PAREN_FIGURE.sub('', text)
+    text = PAREN_CITATION.sub('', text)
+    text = ET_AL.sub('', text)
+    text = IBID.sub('', text)
+    text = INLINE_FIGURE.sub('', text)
+    text = BARE_FIGURE.sub('', text)
+    text = ABBREVIATION.sub(lambda m: ABBREVIATIONS[m.group(0)], text)
+    text = UNIT.sub(lambda m: ' ' + UNITS[m.group(1)], text)
+    text = EQUALS.sub(' equals ', text)
+    text = normalize_symbols(text)
+    text = WHITESPACE.sub(' ', text)
+    text = SPACE_BEFORE_PUNCT.sub(r'\1', text)
+    text = SPACE_AFTER_BRACKET.sub(r'\1', text)
+    text = BLANK_LINES.sub('\n\n', text)
+    return text.strip()
@@ -0,0 +1,121 @@
+"""
+Rule-based Stage 2 section detection
+Finds known section headers, drops non-narrative sections and emits the
+remaining ones in standard order with [SECTION: Name] markers, as described
+in STAGE2_REORGANIZATION_PROMPT
+"""
+import re
+
+# Canonical section name -> header variants that map to it
+SECTION_ALIASES = {
+    'Abstract': ['Abstract', 'Summary', 'Author Summary'],
+    'Introduction': ['Introduction', 'Background'],
+    'Related Work': ['Related Work', 'Literature Review', 'Previous Work'],
+    'Methods': [
+        'Methods', 'Methodology', 'Materials and Methods', 'Material and Methods',
+        'Methods and Materials', 'Experimental Procedures', 'Experimental Setup',
+        'Experimental Section', 'Experimental',
+    ],
+    'Results': ['Results', 'Findings'],
+    'Results and Discussion': ['Results and Discussion'],
+    'Discussion': ['Discussion'],
+    'Conclusion': [
+        'Conclusion', 'Conclusions', 'Concluding Remarks', 'Future Work',
+        'Conclusions and Future Work',
+    ],
+    'Acknowledgments': ['Acknowledgments', 'Acknowledgements', 'Acknowledgment', 'Acknowledgement'],
+}
+
+SECTION_ORDER = [
+    'Abstract',
+    'Introduction',
+    'Related Work',
+    'Methods',
+    'Results',
+    'Results and Discussion',
+    'Discussion',
+    'Conclusion',
+    'Acknowledgments',
+]
+
+# Sections left out of the TTS output entirely
+SKIP_SECTIONS = [
+    'References', 'Bibliography', 'Literature Cited', 'Works Cited',
+    'Appendix', 'Appendices', 'Supplementary Material', 'Supplementary Materials',
+    'Supplementary Information', 'Supporting Information',
+    'Funding', 'Conflict of Interest', 'Conflicts of Interest', 'Competing Interests',
+    'Declaration of Competing Interest', 'Author Contributions',
+]
+
+# Lower-cased header text -> canonical name (None for skipped sections)
+HEADER_NAMES = {alias.lower(): name for name, aliases in SECTION_ALIASES.items() for alias in aliases}
+HEADER_NAMES.update({skip.lower(): None for skip in SKIP_SECTIONS})
+
+# A header is a whole line: optional numbering ("2.", "2.1", "IV."), a known
+# name, optional trailing colon or period
+HEADER = re.compile(
+    r'^[ \t]*(?:(?:\d+(?:\.\d+)*|[IVX]+)\.?[ \t]+)?('
+    + '|'.join(
+        r'[ \t]+'.join(re.escape(word) for word in header.split())
+        for header in sorted(HEADER_NAMES, key=len, reverse=True)
+    )
+    + r')[ \t]*[:.]?[ \t]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+WHITESPACE = re.compile(r'\s+')
+
+# Text before the first header is usually title/authors/affiliations, but
+# papers without an "Abstract" header often open with the abstract itself
+MIN_PREAMBLE_ABSTRACT_WORDS = 50
+
+
+def split_sections(text: str) -> list[tuple[str, str]]:
+    """
+    Split text into (canonical name, content) pairs in standard order
+
+    Repeated sections are merged in document order, skipped sections
+    (references, appendices, ...) are dropped, and unrecognized headers stay
+    part of the section they appear in.
+
+    Args:
+        text: Cleaned paper text
+
+    Returns:
+        List of (section name, section text) in SECTION_ORDER
+    """
+    matches = list(HEADER.finditer(text))
+    if not matches:
+        body = text.strip()
+        return [('Main Text', body)] if body else []
+
+    sections = {}
+
+    for i, match in enumerate(matches):
+        name = HEADER_NAMES[WHITESPACE.sub(' ', match.group(1)).lower()]
+        if name is None:
+            continue
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        content = text[match.end():end].strip()
+        if content:
+            sections.setdefault(name, []).append(content)
+
+    preamble = text[:matches[0].start()].strip()
+    if 'Abstract' not in sections and len(preamble.split()) >= MIN_PREAMBLE_ABSTRACT_WORDS:
+        sections['Abstract'] = [preamble]
+
+    return [(name, '\n\n'.join(sections[name])) for name in SECTION_ORDER if name in sections]
+
+
+def reorganize(text: str) -> str:
+    """
+    Reorganize paper text into [SECTION: Name] blocks in standard order
+
+    Args:
+        text: Cleaned paper text
+
+    Returns:
+        Text with one "[SECTION: Name]" marker line before each section
+    """
+    return '\n\n'.join(
+        f'[SECTION: {name}]\n{content}' for name, content in split_sections(text)
+    )
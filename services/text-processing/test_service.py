@@ -5,8 +5,123 @@ Validates service structure, prompts, and API without loading actual models
 """
 import sys
 import json
+import re
 from prompts import STAGE1_CLEANUP_PROMPT, STAGE2_REORGANIZATION_PROMPT
 
+# Optional: google-re2 matches in linear time with no backtracking
+# (pip install google-re2); the standard re module is used without it
+try:
+    import re2
+except ImportError:
+    re2 = None
+_regex = re2 if re2 is not None else re
+
+# Sections the simulated Stage 2 emits, in order, and the headers it detects
+_STANDARD_ORDER = ('Abstract', 'Introduction', 'Methods', 'Results', 'Discussion')
+_STANDARD_SET = frozenset(_STANDARD_ORDER)
+_ALL_SECTIONS = _STANDARD_SET | frozenset(('References',))
+
+# Patterns used by the simulations, compiled once at import. Parenthetical
+# citations are capped at 200 characters so an unclosed "(" cannot make the
+# backtracking engine rescan the rest of the text
+_CITATION_RE = _regex.compile(r'\[[\d,\-]+\]|\([A-Z][^)]{1,200}\d{4}\)')
+_FIGURE_RE = _regex.compile(r'Figure \d+[A-Z]?|Table \d+')
+_SECTION_RE = _regex.compile(r'(?m)^(' + '|'.join(sorted(_ALL_SECTIONS)) + r')$')
+_MARKER_RE = _regex.compile(r'\[SECTION: ([^\]]+)\]')
+
+# Citations and parenthetical figure/table references, removed in one pass
+_REMOVE_RE = _regex.compile(
+    r'\(see (?:Figure \d+[A-Z]?|Table \d+)\)|\((?:Figure \d+[A-Z]?|Table \d+)\)'
+    r'|\[[\d,\-]+\]|\([A-Z][^)]{1,200}\d{4}\)'
+)
+
+_ABBREV = {
+    'e.g.': 'for example',
+    'µg/ml': 'micrograms per milliliter',
+    'LD₅₀': 'lethal dose fifty',
+    '°C': 'degrees Celsius',
+    '±': 'plus or minus',
+    'α': 'alpha',
+    'β': 'beta'
+}
+# Longest first so no abbreviation is shadowed by one of its prefixes
+_ABBREV_RE = re.compile('|'.join(map(re.escape, sorted(_ABBREV, key=len, reverse=True))))
+
+# Optional: an Aho-Corasick automaton finds every abbreviation in one
+# linear scan (pip install pyahocorasick); _ABBREV_RE is used without it
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+if ahocorasick is not None:
+    _ABBREV_AUTOMATON = ahocorasick.Automaton()
+    for _abbr, _expanded in _ABBREV.items():
+        _ABBREV_AUTOMATON.add_word(_abbr, (len(_abbr), _expanded))
+    _ABBREV_AUTOMATON.make_automaton()
+else:
+    _ABBREV_AUTOMATON = None
+
+
+def _expand_abbreviations(text):
+    """Replace every _ABBREV key in text with its expansion"""
+    if _ABBREV_AUTOMATON is None:
+        return _ABBREV_RE.sub(lambda m: _ABBREV[m.group(0)], text)
+
+    # iter_long yields the longest non-overlapping match at each position
+    # as (index of its last character, value)
+    parts = []
+    position = 0
+    for end, (length, expanded) in _ABBREV_AUTOMATON.iter_long(text):
+        parts.extend((text[position:end - length + 1], expanded))
+        position = end + 1
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+# Optional: compile the section span arithmetic with Numba
+# (pip install numba); plain Python lists are used without it
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+
+def _compute_spans_python(starts, ends, text_length):
+    """
+    Content span of each section: from the end of its header to the start
+    of the next header (or the end of the text)
+    """
+    count = len(starts)
+    content_starts = [0] * count
+    content_ends = [0] * count
+    for i in range(count):
+        content_starts[i] = ends[i]
+        content_ends[i] = starts[i + 1] if i + 1 < count else text_length
+    return content_starts, content_ends
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _compute_spans_native(starts, ends, text_length):
+        count = starts.shape[0]
+        content_starts = np.empty(count, np.uint32)
+        content_ends = np.empty(count, np.uint32)
+        for i in range(count):
+            content_starts[i] = ends[i]
+            content_ends[i] = starts[i + 1] if i + 1 < count else text_length
+        return content_starts, content_ends
+
+    def _compute_spans(starts, ends, text_length):
+        content_starts, content_ends = _compute_spans_native(
+            np.asarray(starts, np.uint32), np.asarray(ends, np.uint32), np.uint32(text_length)
+        )
+        return content_starts.tolist(), content_ends.tolist()
+else:
+    _compute_spans = _compute_spans_python
+
 # Test sample text (from a scientific paper)
 SAMPLE_TEXT = """
 Abstract
@@ -82,21 +197,11 @@ def simulate_stage1_processing(text):
     print("  1. Remove citations:")
 
     # Count citations to remove
-    import re
-    citations = re.findall(r'\[[\d,\-]+\]|\([A-Z][^)]+\d{4}\)', text)
+    citations = _CITATION_RE.findall(text)
     print(f"     - Found {len(citations)} citations to remove")
 
     print("  2. Expand abbreviations:")
-    abbreviations = {
-        'e.g.': 'for example',
-        'µg/ml': 'micrograms per milliliter',
-        'LD₅₀': 'lethal dose fifty',
-        '°C': 'degrees Celsius',
-        '±': 'plus or minus',
-        'α': 'alpha',
-        'β': 'beta'
-    }
-    for abbr, expanded in abbreviations.items():
+    for abbr, expanded in _ABBREV.items():
         if abbr in text:
             print(f"     - {abbr} → {expanded}")
 
@@ -105,23 +210,17 @@ def simulate_stage1_processing(text):
         print(f"     - C. quinquefasciatus → Culex quinquefasciatus (first occurrence)")
 
     print("  4. Remove figure/table references:")
-    figures = re.findall(r'Figure \d+[A-Z]?|Table \d+', text)
+    figures = _FIGURE_RE.findall(text)
     print(f"     - Found {len(figures)} figure/table references to remove")
 
     print("  5. Preserve section structure:")
-    sections = re.findall(r'^(Abstract|Introduction|Methods|Results|Discussion|References)$', text, re.MULTILINE)
+    sections = _SECTION_RE.findall(text)
     print(f"     - Detected {len(sections)} section headers to preserve")
 
-    # Simulate cleaned output
-    cleaned_text = text
-    for citation in citations:
-        cleaned_text = cleaned_text.replace(citation, '')
-    for abbr, expanded in abbreviations.items():
-        cleaned_text = cleaned_text.replace(abbr, expanded)
+    # Simulate cleaned output: one scan for removals, one for abbreviations
+    cleaned_text = _REMOVE_RE.sub('', text)
+    cleaned_text = _expand_abbreviations(cleaned_text)
     cleaned_text = cleaned_text.replace('C. quinquefasciatus', 'Culex quinquefasciatus', 1)
-    for fig in figures:
-        cleaned_text = cleaned_text.replace(f"(see {fig})", "")
-        cleaned_text = cleaned_text.replace(f"({fig})", "")
 
     print(f"\n✓ Stage 1 output: {len(cleaned_text)} characters")
     print("\n✅ Stage 1 simulation complete\n")
@@ -140,45 +239,37 @@ def simulate_stage2_processing(text):
     print("\nStage 2 Tasks (based on prompt):")
     print("  1. Detect sections:")
 
-    import re
-    sections_detected = []
-    for line in text.split('\n'):
-        line = line.strip()
-        if line in ['Abstract', 'Introduction', 'Methods', 'Results', 'Discussion', 'References']:
-            sections_detected.append(line)
+    # One scan for the headers (finditer yields them in position order);
+    # each section runs to the next header
+    matches = list(_SECTION_RE.finditer(text))
+    sections_detected = [m.group(1) for m in matches]
+    content_starts, content_ends = _compute_spans(
+        [m.start() for m in matches], [m.end() for m in matches], len(text)
+    )
+    section_content = {}
+    for name, start, end in zip(sections_detected, content_starts, content_ends):
+        section_content.setdefault(name, text[start:end].strip())
 
     print(f"     - Detected sections: {', '.join(sections_detected)}")
 
     print("  2. Reorder to standard sequence:")
-    standard_order = ['Abstract', 'Introduction', 'Methods', 'Results', 'Discussion']
-    print(f"     - Standard order: {' → '.join(standard_order)}")
+    print(f"     - Standard order: {' → '.join(_STANDARD_ORDER)}")
 
     print("  3. Skip References section")
 
     print("  4. Add [SECTION: Name] markers:")
 
     # Simulate reorganized output
-    reorganized = ""
-    for section in standard_order:
-        if section in sections_detected:
-            reorganized += f"\n[SECTION: {section}]\n"
-            # Extract section content (simplified)
-            start = text.find(section)
-            if start != -1:
-                # Find next section or end
-                next_section_start = len(text)
-                for other_section in sections_detected:
-                    if other_section != section:
-                        pos = text.find(other_section, start + len(section))
-                        if pos != -1 and pos < next_section_start:
-                            next_section_start = pos
-
-                content = text[start + len(section):next_section_start].strip()
-                reorganized += content + "\n"
-                print(f"     - Added [SECTION: {section}] with {len(content)} chars")
+    parts = []
+    for section in _STANDARD_ORDER:
+        if section in section_content:
+            content = section_content[section]
+            parts.extend((f"\n[SECTION: {section}]\n", content, "\n"))
+            print(f"     - Added [SECTION: {section}] with {len(content)} chars")
+    reorganized = "".join(parts)
 
     print(f"\n✓ Stage 2 output: {len(reorganized)} characters")
-    print(f"✓ Sections in output: {len(standard_order)}")
+    print(f"✓ Sections in output: {len(_STANDARD_ORDER)}")
     print("\n✅ Stage 2 simulation complete\n")
 
     return reorganized
@@ -189,36 +280,61 @@ def test_output_format(text):
     print("TEST 4: Validate Output Format")
     print("=" * 80)
 
-    import re
-    section_markers = re.findall(r'\[SECTION: ([^\]]+)\]', text)
+    section_markers = _MARKER_RE.findall(text)
 
     print(f"\nFound {len(section_markers)} section markers:")
     for marker in section_markers:
         print(f"  - [SECTION: {marker}]")
 
     # Verify sections are in correct order
-    expected_order = ['Abstract', 'Introduction', 'Methods', 'Results', 'Discussion']
-    actual_order = [m for m in section_markers if m in expected_order]
+    actual_order = [m for m in section_markers if m in _STANDARD_SET]
+    present = frozenset(actual_order)
 
-    if actual_order == [s for s in expected_order if s in actual_order]:
+    if actual_order == [s for s in _STANDARD_ORDER if s in present]:
         print("\n✓ Sections are in correct order")
     else:
         print(f"\n✗ Section order incorrect: {actual_order}")
 
     print("\n✅ Output format validated\n")
 
+def test_rule_cleanup():
+    """Test the Stage 1 rules remove citations, math and figure references but keep look-alikes"""
+    print("=" * 80)
+    print("TEST 5: Validate Stage 1 Rules")
+    print("=" * 80)
+
+    import rule_cleanup
+
+    cases = {
+        "Resistance rose (Smith et al., 2019; Lee, 2021) and fell (Smith and Jones, 2020a).":
+            "Resistance rose and fell.",
+        "Samples (Group A, 2020) were taken.": "Samples (Group A, 2020) were taken.",
+        "The value $x^2$ grows.": "The value grows.",
+        "The kit costs $5 and the refill $10 respectively.":
+            "The kit costs $5 and the refill $10 respectively.",
+        "Samples from (a) 2018, (b) 2019 and (c) 2020 were compared. Next sentence here.":
+            "Samples from (a) 2018, (b) 2019 and (c) 2020 were compared. Next sentence here.",
+        "Results are as shown in Figure 2 and Table 1.": "Results are.",
+        "See https://example.org/x. Next sentence.": "See. Next sentence.",
+    }
+    for text, expected in cases.items():
+        cleaned = rule_cleanup.apply(text)
+        assert cleaned == expected, f"{text!r} -> {cleaned!r}, expected {expected!r}"
+        print(f"✓ {text!r}")
+
+    print("\n✅ Stage 1 rules validated\n")
+
 def test_api_structure():
     """Test that the API structure is correct"""
     print("=" * 80)
-    print("TEST 5: Validate API Structure")
+    print("TEST 6: Validate API Structure")
     print("=" * 80)
 
     # Import main to check structure
     import main
 
     print("\n✓ FastAPI app exists:", hasattr(main, 'app'))
-    print("✓ Stage 1 model variable:", hasattr(main, 'stage1_model'))
-    print("✓ Stage 2 model variable:", hasattr(main, 'stage2_model'))
+    print("✓ Stage handle class:", hasattr(main, 'StageHandle'))
     print("✓ Load stage1 function:", hasattr(main, 'load_stage1_model'))
     print("✓ Load stage2 function:", hasattr(main, 'load_stage2_model'))
     print("✓ Unload stage1 function:", hasattr(main, 'unload_stage1_model'))
@@ -251,7 +367,10 @@ def main():
         # Test 4: Validate output format
         test_output_format(stage2_output)
 
-        # Test 5: Check API structure
+        # Test 5: Stage 1 rules
+        test_rule_cleanup()
+
+        # Test 6: Check API structure
         test_api_structure()
 
         print("=" * 80)
@@ -2,6 +2,8 @@
 Pytest configuration for TTS service tests
 """
 import os
+from pathlib import Path
+
 import pytest
 
 # Set environment variables for testing before importing the app
@@ -10,16 +12,17 @@ os.environ["VOICES_PATH"] = "/tmp/kokoro_models/voices-v1.0.bin"
 os.environ["ONNX_NUM_THREADS"] = "4"  # Reduce threads for testing
 
 
-def pytest_configure(config):
-    """Configure pytest"""
-    # Ensure model files exist
-    model_path = os.getenv("MODEL_PATH")
-    voices_path = os.getenv("VOICES_PATH")
+@pytest.fixture(scope="session", autouse=True)
+def model_files():
+    """Ensure model files exist (checked once, when tests run rather than at collection)"""
+    model_path = Path(os.environ["MODEL_PATH"])
+    voices_path = Path(os.environ["VOICES_PATH"])
 
-    if not os.path.exists(model_path) or not os.path.exists(voices_path):
+    if not model_path.is_file() or not voices_path.is_file():
         pytest.exit(
             f"Model files not found. Run test_kokoro_generation.py first to download them.\n"
             f"Expected:\n"
             f"  - {model_path}\n"
             f"  - {voices_path}"
         )
+    return model_path, voices_path
@@ -3,21 +3,33 @@ Kokoro TTS Service v2 - Production FastAPI Application
 High-quality TTS using Kokoro-82M model optimized for CPU
 """
 import os
+import asyncio
 import time
-import base64
+import binascii
 import io
 import logging
+import struct
+import threading
 from pathlib import Path
 from typing import Optional
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel, Field, field_validator
+import numpy as np
 import soundfile as sf
 
 from tts_engine import TTSEngine, TTSError, VoiceNotFoundError, TextPreprocessingError
 
+# Optional: pybase64's SIMD encoder is several times faster on multi-MB WAVs
+# and writes straight into one exact-size str, with no intermediate bytes
+try:
+    from pybase64 import b64encode_as_string
+except ImportError:
+    def b64encode_as_string(data) -> str:
+        return binascii.b2a_base64(data, newline=False).decode('ascii')
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,16 +38,32 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configuration
-MODEL_PATH = os.getenv("MODEL_PATH", "/app/models/kokoro-v1.0.onnx")
+MODEL_PATH = os.getenv("MODEL_PATH", "/app/models/kokoro-v1.0.onnx")  # "skip": start without a model
 VOICES_PATH = os.getenv("VOICES_PATH", "/app/models/voices-v1.0.bin")
 ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "8"))
+ONNX_GRAPH_OPT = os.getenv("ONNX_GRAPH_OPT", "all").lower()  # disable | basic | extended | all
+ONNX_EXECUTION_MODE = os.getenv("ONNX_EXECUTION_MODE", "sequential").lower()  # sequential | parallel
+ONNX_ARENA = os.getenv("ONNX_ARENA", "true").lower() == "true"  # CPU memory arena
 DEFAULT_VOICE = os.getenv("DEFAULT_VOICE", "af_sarah")
 DEFAULT_SPEED = float(os.getenv("DEFAULT_SPEED", "1.0"))
 MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", "5000"))
+# Syntheses run at once, each on ONNX_NUM_THREADS threads; keep
+# SYNTH_CONCURRENCY * ONNX_NUM_THREADS at or below the core count
+SYNTH_CONCURRENCY = int(os.getenv("SYNTH_CONCURRENCY", "2"))
+# Sentence chunks of one long text synthesized in parallel (also counts
+# against the core budget above)
+SYNTH_CHUNK_WORKERS = int(os.getenv("SYNTH_CHUNK_WORKERS", "1"))
+# Largest request body that can hold a valid request: MAX_TEXT_LENGTH
+# characters JSON-escaped at up to 12 bytes each (an astral character as a
+# \uXXXX\uXXXX surrogate pair), plus the other JSON fields
+MAX_REQUEST_BYTES = MAX_TEXT_LENGTH * 12 + 512
 
 # Global TTS engine
 tts_engine: Optional[TTSEngine] = None
 
+# Bounds the synthesis worker threads (see SYNTH_CONCURRENCY)
+synth_semaphore = asyncio.Semaphore(SYNTH_CONCURRENCY)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -46,24 +74,43 @@ async def lifespan(app: FastAPI):
     logger.info("Kokoro TTS Service v2 Starting...")
     logger.info("=" * 60)
     logger.info(f"Model path: {MODEL_PATH}")
+    logger.info(f"Model weights: {'int8 (dynamic quantization)' if '.int8.' in Path(MODEL_PATH).name else 'fp32'}")
     logger.info(f"Voices path: {VOICES_PATH}")
     logger.info(f"ONNX threads: {ONNX_NUM_THREADS}")
+    logger.info(f"ONNX graph optimization: {ONNX_GRAPH_OPT}, execution: {ONNX_EXECUTION_MODE}, arena: {ONNX_ARENA}")
     logger.info(f"Default voice: {DEFAULT_VOICE}")
     logger.info(f"Max text length: {MAX_TEXT_LENGTH}")
-
-    try:
-        tts_engine = TTSEngine(
-            model_path=MODEL_PATH,
-            voices_path=VOICES_PATH,
-            auto_load=True,
-            default_voice=DEFAULT_VOICE,
-            default_speed=DEFAULT_SPEED,
-        )
-        logger.info(f"✓ Model loaded successfully with {len(tts_engine.available_voices)} voices")
-        logger.info("✓ TTS service ready")
-    except Exception as e:
-        logger.error(f"✗ Failed to load model: {e}")
-        logger.error("Service will start but synthesis will fail")
+    logger.info(f"Synthesis concurrency: {SYNTH_CONCURRENCY}, chunk workers: {SYNTH_CHUNK_WORKERS}")
+
+    if MODEL_PATH == "skip":
+        logger.warning("⚠ MODEL_PATH=skip, starting without a model")
+    else:
+        # Missing files are downloaded by TTSEngine; check off the event loop
+        if not await asyncio.to_thread(Path(MODEL_PATH).is_file):
+            logger.warning(f"⚠ Model file not found at {MODEL_PATH}, it will be downloaded")
+
+        try:
+            tts_engine = TTSEngine(
+                model_path=MODEL_PATH,
+                voices_path=VOICES_PATH,
+                auto_load=True,
+                default_voice=DEFAULT_VOICE,
+                default_speed=DEFAULT_SPEED,
+                num_threads=ONNX_NUM_THREADS,
+                session_opts={
+                    "graph_opt": ONNX_GRAPH_OPT,
+                    "execution_mode": ONNX_EXECUTION_MODE,
+                    "arena": ONNX_ARENA,
+                },
+                chunk_workers=SYNTH_CHUNK_WORKERS,
+            )
+            # Voices only change when the model is (re)loaded
+            app.state.voice_categories = categorize_voices(tts_engine.available_voices)
+            logger.info(f"✓ Model loaded successfully with {len(tts_engine.available_voices)} voices")
+            logger.info("✓ TTS service ready")
+        except Exception as e:
+            logger.error(f"✗ Failed to load model: {e}")
+            logger.error("Service will start but synthesis will fail")
 
     yield  # Server is running
 
@@ -77,6 +124,8 @@ app = FastAPI(
     description="High-quality Text-to-Speech using Kokoro-82M with improved error handling and preprocessing",
     version="2.0.0",
     lifespan=lifespan,
+    # orjson serializes the multi-MB base64 audio string much faster than json
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -160,6 +209,23 @@ class VoicesResponse(BaseModel):
     categories: dict = Field(..., description="Voices grouped by category")
 
 
+# ==================== Middleware ====================
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Reject oversized bodies by Content-Length before they are read and parsed"""
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > MAX_REQUEST_BYTES:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content=ErrorResponse(
+                error="RequestTooLarge",
+                message=f"Request body exceeds {MAX_REQUEST_BYTES} bytes"
+            ).model_dump()
+        )
+    return await call_next(request)
+
+
 # ==================== Exception Handlers ====================
 
 @app.exception_handler(VoiceNotFoundError)
@@ -200,6 +266,191 @@ async def tts_error_handler(request: Request, exc: TTSError):
     )
 
 
+# ==================== Helper Functions ====================
+
+# Voice ID prefix -> /voices category
+VOICE_CATEGORIES = {
+    "af_": "american_female",
+    "am_": "american_male",
+    "bf_": "british_female",
+    "bm_": "british_male",
+}
+
+
+def categorize_voices(voices: list[str]) -> dict:
+    """Group voice IDs by accent and gender prefix in a single pass"""
+    categories = {category: [] for category in VOICE_CATEGORIES.values()}
+    categories["other"] = []
+    for voice in voices:
+        categories[VOICE_CATEGORIES.get(voice[:3], "other")].append(voice)
+    return categories
+
+
+# ==================== Synthesis ====================
+
+# Canonical 44-byte header of a mono 16-bit PCM WAV file
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+# Per-thread float32 buffer for PCM conversion, grown to the longest clip seen
+pcm_scratch = threading.local()
+
+
+def pcm_scratch_buffer(n_samples: int) -> np.ndarray:
+    """Return this thread's float32 scratch buffer, sliced to n_samples"""
+    buffer = getattr(pcm_scratch, "buffer", None)
+    if buffer is None or buffer.size < n_samples:
+        buffer = pcm_scratch.buffer = np.empty(n_samples, dtype=np.float32)
+    return buffer[:n_samples]
+
+
+def encode_wav_pcm16(audio: np.ndarray, sample_rate: int) -> bytearray:
+    """
+    Encode mono float or int16 samples as a 16-bit PCM WAV file
+
+    The header is packed directly and samples are converted straight into the
+    output buffer with no soundfile call. Float input is clipped, scaled and
+    rounded by whole-array NumPy ops in a reused scratch buffer, leaving
+    audio untouched.
+    """
+    data_size = len(audio) * 2
+    wav = bytearray(WAV_HEADER.size + data_size)
+    WAV_HEADER.pack_into(
+        wav, 0,
+        b'RIFF', WAV_HEADER.size - 8 + data_size, b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', data_size,
+    )
+
+    pcm = np.frombuffer(wav, dtype='<i2', offset=WAV_HEADER.size)
+    if audio.dtype.kind == 'f':
+        scaled = pcm_scratch_buffer(len(audio))
+        np.clip(audio, -1.0, 1.0, out=scaled)
+        np.multiply(scaled, 32767, out=scaled)
+        np.rint(scaled, out=scaled)
+        pcm[:] = scaled
+    else:
+        pcm[:] = audio
+    return wav
+
+
+def synthesize_wav(request: SynthesizeRequest, start_time: float):
+    """
+    Synthesize a request and encode it as WAV (blocking)
+
+    Returns:
+        Tuple of (WAV bytes-like object, sample_rate, engine metadata,
+        total processing time)
+    """
+    audio, sample_rate, metadata = tts_engine.synthesize(
+        text=request.text,
+        voice=request.voice,
+        speed=request.speed,
+        preprocess=request.preprocess,
+        remove_citations=request.remove_citations,
+    )
+
+    # Mono float/int16 PCM gets a hand-packed WAV; anything else goes
+    # through soundfile, read back from the buffer's memory (no copy)
+    if audio.ndim == 1 and (audio.dtype.kind == 'f' or audio.dtype == np.int16):
+        wav = encode_wav_pcm16(audio, sample_rate)
+    else:
+        wav_buffer = io.BytesIO()
+        sf.write(wav_buffer, audio, sample_rate, format='WAV')
+        wav = wav_buffer.getbuffer()
+
+    total_time = time.time() - start_time
+
+    logger.info(
+        f"✓ Synthesis complete: {metadata['duration_seconds']:.2f}s audio "
+        f"generated in {total_time:.2f}s (RTF: {metadata['rtf']:.3f})"
+    )
+    return wav, sample_rate, metadata, total_time
+
+
+def run_synthesis(request: SynthesizeRequest, start_time: float) -> SynthesizeResponse:
+    """
+    Synthesize, encode and build the JSON response for a request (blocking)
+
+    Runs in a worker thread so the event loop stays free for other requests.
+    """
+    wav, sample_rate, metadata, total_time = synthesize_wav(request, start_time)
+    audio_base64 = b64encode_as_string(wav)
+
+    return SynthesizeResponse(
+        success=True,
+        audio_base64=audio_base64,
+        sample_rate=sample_rate,
+        duration_seconds=metadata['duration_seconds'],
+        processing_time_seconds=total_time,
+        rtf=metadata['rtf'],
+        voice=metadata['voice'],
+        text_length=metadata['processed_text_length'],
+        metadata={
+            'original_text_length': metadata['original_text_length'],
+            'audio_samples': metadata['audio_samples'],
+            'chunks': metadata['chunks'],
+            'audio_size_bytes': len(wav),
+            'base64_size_bytes': len(audio_base64),
+        }
+    )
+
+
+def run_synthesis_wav(request: SynthesizeRequest, start_time: float) -> Response:
+    """
+    Synthesize a request and build a raw WAV response (blocking)
+
+    Synthesis details are returned in X-* headers.
+    """
+    wav, sample_rate, metadata, total_time = synthesize_wav(request, start_time)
+
+    return Response(
+        content=bytes(wav),
+        media_type="audio/wav",
+        headers={
+            "X-Sample-Rate": str(sample_rate),
+            "X-Duration-Seconds": f"{metadata['duration_seconds']:.3f}",
+            "X-Processing-Time-Seconds": f"{total_time:.3f}",
+            "X-RTF": f"{metadata['rtf']:.3f}",
+            "X-Voice": metadata['voice'],
+            "X-Text-Length": str(metadata['processed_text_length']),
+        }
+    )
+
+
+async def handle_synthesis(request: SynthesizeRequest, run):
+    """Check the model is ready and run a synthesis function in a worker thread"""
+    start_time = time.time()
+
+    if tts_engine is None or not tts_engine.is_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded - service not ready"
+        )
+
+    try:
+        logger.info(
+            f"Synthesis request: {len(request.text)} chars, "
+            f"voice={request.voice or DEFAULT_VOICE}, "
+            f"speed={request.speed or DEFAULT_SPEED}, "
+            f"preprocess={request.preprocess}"
+        )
+
+        # Synthesis and encoding are CPU-bound; run them off the event loop
+        async with synth_semaphore:
+            return await asyncio.to_thread(run, request, start_time)
+
+    except (VoiceNotFoundError, TextPreprocessingError, TTSError):
+        # These will be handled by exception handlers
+        raise
+
+    except Exception as e:
+        logger.error(f"Unexpected error during synthesis: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Synthesis failed: {str(e)}"
+        )
+
+
 # ==================== API Endpoints ====================
 
 @app.get("/")
@@ -213,7 +464,8 @@ async def root():
         "endpoints": {
             "health": "GET /health",
             "voices": "GET /voices",
-            "synthesize": "POST /synthesize"
+            "synthesize": "POST /synthesize",
+            "synthesize_wav": "POST /synthesize/wav"
         }
     }
 
@@ -253,20 +505,11 @@ async def list_voices():
 
     voices = tts_engine.available_voices
 
-    # Categorize voices
-    categories = {
-        "american_female": [v for v in voices if v.startswith("af_")],
-        "american_male": [v for v in voices if v.startswith("am_")],
-        "british_female": [v for v in voices if v.startswith("bf_")],
-        "british_male": [v for v in voices if v.startswith("bm_")],
-        "other": [v for v in voices if not any(v.startswith(p) for p in ["af_", "am_", "bf_", "bm_"])]
-    }
-
     return VoicesResponse(
         voices=voices,
         count=len(voices),
         default=DEFAULT_VOICE,
-        categories=categories
+        categories=app.state.voice_categories
     )
 
 
@@ -288,73 +531,19 @@ async def synthesize(request: SynthesizeRequest):
     }
     ```
     """
-    start_time = time.time()
+    return await handle_synthesis(request, run_synthesis)
 
-    if tts_engine is None or not tts_engine.is_loaded:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Model not loaded - service not ready"
-        )
 
-    try:
-        logger.info(
-            f"Synthesis request: {len(request.text)} chars, "
-            f"voice={request.voice or DEFAULT_VOICE}, "
-            f"speed={request.speed or DEFAULT_SPEED}, "
-            f"preprocess={request.preprocess}"
-        )
-
-        # Synthesize audio
-        audio, sample_rate, metadata = tts_engine.synthesize(
-            text=request.text,
-            voice=request.voice,
-            speed=request.speed,
-            preprocess=request.preprocess,
-            remove_citations=request.remove_citations,
-        )
-
-        # Convert to WAV bytes
-        wav_buffer = io.BytesIO()
-        sf.write(wav_buffer, audio, sample_rate, format='WAV')
-        wav_bytes = wav_buffer.getvalue()
-
-        # Encode as base64
-        audio_base64 = base64.b64encode(wav_bytes).decode('utf-8')
-
-        total_time = time.time() - start_time
-
-        logger.info(
-            f"✓ Synthesis complete: {metadata['duration_seconds']:.2f}s audio "
-            f"generated in {total_time:.2f}s (RTF: {metadata['rtf']:.3f})"
-        )
-
-        return SynthesizeResponse(
-            success=True,
-            audio_base64=audio_base64,
-            sample_rate=sample_rate,
-            duration_seconds=metadata['duration_seconds'],
-            processing_time_seconds=total_time,
-            rtf=metadata['rtf'],
-            voice=metadata['voice'],
-            text_length=metadata['processed_text_length'],
-            metadata={
-                'original_text_length': metadata['original_text_length'],
-                'audio_samples': metadata['audio_samples'],
-                'audio_size_bytes': len(wav_bytes),
-                'base64_size_bytes': len(audio_base64),
-            }
-        )
-
-    except (VoiceNotFoundError, TextPreprocessingError, TTSError):
-        # These will be handled by exception handlers
-        raise
+@app.post("/synthesize/wav", response_class=Response)
+async def synthesize_wav_file(request: SynthesizeRequest):
+    """
+    Synthesize speech from text and return the WAV file itself
 
-    except Exception as e:
-        logger.error(f"Unexpected error during synthesis: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Synthesis failed: {str(e)}"
-        )
+    Same request body as /synthesize. The body is audio/wav, without the
+    base64 encoding and its ~33% size overhead; sample rate, duration,
+    processing time, RTF, voice and processed text length are in X-* headers.
+    """
+    return await handle_synthesis(request, run_synthesis_wav)
 
 
 # ==================== Main ====================
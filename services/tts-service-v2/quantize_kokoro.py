@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Produce an INT8 dynamically-quantized Kokoro ONNX model
+
+Weights are stored as int8 and activations are quantized at run time, which
+cuts the weight bytes read per inference by ~4x; ONNX Runtime uses VNNI int8
+dot products on CPUs that have them. Point MODEL_PATH at the output file to
+use it.
+
+Usage:
+    python quantize_kokoro.py [input.onnx] [output.onnx]
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+DEFAULT_INPUT = "/app/models/kokoro-v1.0.onnx"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the Kokoro ONNX model to INT8")
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="FP32 model path")
+    parser.add_argument("output", nargs="?", help="Output path (default: <input>.int8.onnx)")
+    parser.add_argument(
+        "--op-types",
+        nargs="+",
+        default=["MatMul"],
+        help="Operator types to quantize (ConvInteger has no int8-weight CPU kernel)"
+    )
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output_path = Path(args.output) if args.output else input_path.with_suffix(".int8.onnx")
+
+    print(f"Quantizing {input_path} -> {output_path} ({', '.join(args.op_types)})")
+    start_time = time.time()
+    quantize_dynamic(
+        str(input_path),
+        str(output_path),
+        op_types_to_quantize=args.op_types,
+        weight_type=QuantType.QInt8,
+    )
+
+    input_mb = os.path.getsize(input_path) / 1024 / 1024
+    output_mb = os.path.getsize(output_path) / 1024 / 1024
+    print(f"✓ Done in {time.time() - start_time:.1f}s: {input_mb:.1f} MB -> {output_mb:.1f} MB")
+    print(f"  Set MODEL_PATH={output_path} to use it")
+
+
+if __name__ == "__main__":
+    main()
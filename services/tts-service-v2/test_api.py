@@ -2,33 +2,149 @@
 Integration tests for TTS API endpoints
 Tests the full API with real HTTP requests
 """
+import asyncio
+import json
 import pytest
 import pytest_asyncio
-import base64
 import io
 from httpx import AsyncClient, ASGITransport
+import numpy as np
+import orjson
+import pybase64
 import soundfile as sf
 
-from main import app
+from main import app, encode_wav_pcm16, MAX_TEXT_LENGTH
 
 
-@pytest_asyncio.fixture
+def jload(response):
+    """Parse a JSON response body with orjson (fast on large base64 payloads)"""
+    return orjson.loads(response.content)
+
+
+def fast_wav(buf):
+    """
+    Decode a mono PCM16 WAV as the service writes it (44-byte header)
+
+    Returns (int16 samples, sample_rate); the samples are a view of buf,
+    without libsndfile or float conversion.
+    """
+    header = buf[:44]
+    assert header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+    assert int.from_bytes(header[22:24], "little") == 1  # mono
+    assert int.from_bytes(header[34:36], "little") == 16  # 16-bit
+    sample_rate = int.from_bytes(header[24:28], "little")
+    return np.frombuffer(buf, dtype="<i2", offset=44), sample_rate
+
+
+async def synth(client, text, **kwargs):
+    """POST a synthesis request for text; kwargs are the other request fields"""
+    return await client.post("/synthesize", json={"text": text, **kwargs})
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
 async def client():
-    """Create async HTTP client for testing"""
-    transport = ASGITransport(app=app)
-    async with AsyncClient(transport=transport, base_url="http://test") as ac:
-        yield ac
+    """
+    Async HTTP client shared by all tests
+
+    One in-process client for the whole test run (no real TCP).
+    ASGITransport does not run the app's lifespan, so it is entered here to
+    load the model once for the whole session; the client is closed at the
+    end of the session.
+    """
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def voices_payload(client):
+    """Parsed /voices response shared by the voices tests"""
+    response = await client.get("/voices")
+    assert response.status_code == 200
+    return jload(response)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+async def warmup(client):
+    """Synthesize once before any test so ONNX Runtime initialization stays out of timed requests"""
+    response = await synth(client, "Warming up.")
+    assert response.status_code == 200
+
+
+# Independent synthesis requests whose responses are only inspected, sent
+# together by the synth_responses fixture
+SYNTH_CASES = {
+    "basic": {
+        "text": "Hello world, this is a test.",
+        "voice": "af_sarah",
+        "speed": 1.0
+    },
+    "with_preprocessing": {
+        "text": "This study (Author, 2020) shows results [1].",
+        "preprocess": True,
+        "remove_citations": True
+    },
+    "without_preprocessing": {
+        "text": "Simple text without citations.",
+        "preprocess": False
+    },
+    "different_voice": {
+        "text": "Testing different voice.",
+        "voice": "am_michael"
+    },
+    "long_text": {
+        "text": (
+            "This is a longer piece of text to test the system's ability "
+            "to handle more realistic content. " * 4
+        )
+    },
+    "metadata": {"text": "Testing metadata."},
+}
+
+
+# Requests rejected by pydantic validation (422); none reaches the engine
+VALIDATION_CASES = {
+    "empty_text": {"text": ""},
+    "whitespace_only": {"text": "   \n\t  "},
+    "speed_too_slow": {"text": "Test", "speed": 0.3},
+    "speed_too_fast": {"text": "Test", "speed": 3.0},
+}
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def synth_responses(client):
+    """
+    Responses to SYNTH_CASES by case name
+
+    The requests are gathered so their syntheses overlap (up to the
+    service's SYNTH_CONCURRENCY) instead of running one test at a time.
+    """
+    responses = await asyncio.gather(
+        *(synth(client, **payload) for payload in SYNTH_CASES.values())
+    )
+    return dict(zip(SYNTH_CASES, responses))
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def sample_wav(client):
+    """Synthesize once as raw WAV and decode it, as (audio, sample_rate), for audio checks"""
+    response = await client.post(
+        "/synthesize/wav",
+        json={"text": "Testing audio validity."}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/wav"
+    return fast_wav(response.content)
 
 
 class TestRootEndpoint:
     """Test root endpoint"""
 
-    @pytest.mark.asyncio
     async def test_root(self, client):
         """Test root endpoint returns service info"""
         response = await client.get("/")
         assert response.status_code == 200
-        data = response.json()
+        data = jload(response)
         assert data["service"] == "Kokoro TTS v2"
         assert data["version"] == "2.0.0"
         assert "endpoints" in data
@@ -37,12 +153,11 @@ class TestRootEndpoint:
 class TestHealthEndpoint:
     """Test health check endpoint"""
 
-    @pytest.mark.asyncio
     async def test_health_check(self, client):
         """Test health check returns OK"""
         response = await client.get("/health")
         assert response.status_code == 200
-        data = response.json()
+        data = jload(response)
         assert data["status"] == "healthy"
         assert data["model_loaded"] is True
         assert data["voices_count"] > 0
@@ -52,23 +167,17 @@ class TestHealthEndpoint:
 class TestVoicesEndpoint:
     """Test voices listing endpoint"""
 
-    @pytest.mark.asyncio
-    async def test_list_voices(self, client):
+    async def test_list_voices(self, voices_payload):
         """Test voices endpoint returns list"""
-        response = await client.get("/voices")
-        assert response.status_code == 200
-        data = response.json()
+        data = voices_payload
         assert isinstance(data["voices"], list)
         assert data["count"] > 0
         assert data["default"] == "af_sarah"
         assert "categories" in data
 
-    @pytest.mark.asyncio
-    async def test_voices_categories(self, client):
+    async def test_voices_categories(self, voices_payload):
         """Test voice categorization"""
-        response = await client.get("/voices")
-        data = response.json()
-        categories = data["categories"]
+        categories = voices_payload["categories"]
         assert "american_female" in categories
         assert "american_male" in categories
         assert "british_female" in categories
@@ -81,19 +190,11 @@ class TestVoicesEndpoint:
 class TestSynthesizeEndpoint:
     """Test synthesis endpoint"""
 
-    @pytest.mark.asyncio
-    async def test_synthesize_basic(self, client):
+    async def test_synthesize_basic(self, synth_responses):
         """Test basic synthesis"""
-        response = await client.post(
-            "/synthesize",
-            json={
-                "text": "Hello world, this is a test.",
-                "voice": "af_sarah",
-                "speed": 1.0
-            }
-        )
+        response = synth_responses["basic"]
         assert response.status_code == 200
-        data = response.json()
+        data = jload(response)
 
         assert data["success"] is True
         assert "audio_base64" in data
@@ -103,160 +204,78 @@ class TestSynthesizeEndpoint:
         assert data["rtf"] > 0
         assert data["voice"] == "af_sarah"
 
-    @pytest.mark.asyncio
-    async def test_synthesize_audio_valid(self, client):
-        """Test that returned audio is valid WAV"""
-        response = await client.post(
-            "/synthesize",
-            json={"text": "Testing audio validity."}
-        )
-        assert response.status_code == 200
-        data = response.json()
+    async def test_synthesize_audio_base64(self, synth_responses):
+        """Test the JSON endpoint's base64 audio decodes to the WAV it reports"""
+        data = jload(synth_responses["metadata"])
+        wav = pybase64.b64decode(data["audio_base64"])
 
-        # Decode base64 audio
-        audio_bytes = base64.b64decode(data["audio_base64"])
+        assert wav[:4] == b"RIFF" and wav[8:12] == b"WAVE"
+        assert len(wav) == data["metadata"]["audio_size_bytes"]
 
-        # Verify it's valid WAV
-        audio_buffer = io.BytesIO(audio_bytes)
-        audio, sample_rate = sf.read(audio_buffer)
+    async def test_synthesize_audio_valid(self, sample_wav):
+        """Test that returned audio is valid WAV"""
+        audio, sample_rate = sample_wav
 
         assert len(audio) > 0
         assert sample_rate == 24000
 
-    @pytest.mark.asyncio
-    async def test_synthesize_with_preprocessing(self, client):
-        """Test synthesis with preprocessing enabled"""
-        response = await client.post(
-            "/synthesize",
-            json={
-                "text": "This study (Author, 2020) shows results [1].",
-                "preprocess": True,
-                "remove_citations": True
-            }
-        )
-        assert response.status_code == 200
-        data = response.json()
+    async def test_preprocess_toggle(self, synth_responses):
+        """Test preprocessing is applied only when enabled (smoke test; see TestTextPreprocessor)"""
+        with_preprocessing = synth_responses["with_preprocessing"]
+        without_preprocessing = synth_responses["without_preprocessing"]
+        assert with_preprocessing.status_code == 200
+        assert without_preprocessing.status_code == 200
 
-        # Check that original and processed lengths differ
-        metadata = data["metadata"]
-        assert metadata["original_text_length"] > data["text_length"]
+        # Citations removed: processed text is shorter
+        data = jload(with_preprocessing)
+        assert data["metadata"]["original_text_length"] > data["text_length"]
 
-    @pytest.mark.asyncio
-    async def test_synthesize_without_preprocessing(self, client):
-        """Test synthesis without preprocessing"""
-        response = await client.post(
-            "/synthesize",
-            json={
-                "text": "Simple text without citations.",
-                "preprocess": False
-            }
-        )
-        assert response.status_code == 200
-        data = response.json()
+        # No preprocessing: lengths are the same
+        data = jload(without_preprocessing)
+        assert data["metadata"]["original_text_length"] == data["text_length"]
 
-        # Lengths should be the same
-        metadata = data["metadata"]
-        assert metadata["original_text_length"] == data["text_length"]
-
-    @pytest.mark.asyncio
-    async def test_synthesize_different_voice(self, client):
+    async def test_synthesize_different_voice(self, synth_responses):
         """Test synthesis with different voice"""
-        response = await client.post(
-            "/synthesize",
-            json={
-                "text": "Testing different voice.",
-                "voice": "am_michael"
-            }
-        )
+        response = synth_responses["different_voice"]
         assert response.status_code == 200
-        data = response.json()
+        data = jload(response)
         assert data["voice"] == "am_michael"
 
-    @pytest.mark.asyncio
     async def test_synthesize_different_speed(self, client):
         """Test synthesis with different speeds"""
-        # Normal speed
-        response1 = await client.post(
-            "/synthesize",
-            json={"text": "Testing speech speed.", "speed": 1.0}
+        # Normal and fast speed, synthesized concurrently
+        response1, response2 = await asyncio.gather(
+            synth(client, "Testing speech speed.", speed=1.0),
+            synth(client, "Testing speech speed.", speed=1.5),
         )
-        data1 = response1.json()
-
-        # Fast speed
-        response2 = await client.post(
-            "/synthesize",
-            json={"text": "Testing speech speed.", "speed": 1.5}
-        )
-        data2 = response2.json()
+        data1 = jload(response1)
+        data2 = jload(response2)
 
         # Faster speed should have shorter duration
         assert data2["duration_seconds"] < data1["duration_seconds"]
 
-    @pytest.mark.asyncio
-    async def test_synthesize_empty_text_error(self, client):
-        """Test that empty text returns error"""
-        response = await client.post(
-            "/synthesize",
-            json={"text": ""}
-        )
-        assert response.status_code == 422  # Validation error
-
-    @pytest.mark.asyncio
     async def test_synthesize_invalid_voice_error(self, client):
         """Test that invalid voice returns error"""
-        response = await client.post(
-            "/synthesize",
-            json={
-                "text": "Test",
-                "voice": "invalid_voice_123"
-            }
-        )
+        response = await synth(client, "Test", voice="invalid_voice_123")
         assert response.status_code == 400
-        data = response.json()
+        data = jload(response)
         assert data["success"] is False
         assert data["error"] == "VoiceNotFoundError"
 
-    @pytest.mark.asyncio
-    async def test_synthesize_speed_validation(self, client):
-        """Test speed validation"""
-        # Too slow
-        response1 = await client.post(
-            "/synthesize",
-            json={"text": "Test", "speed": 0.3}
-        )
-        assert response1.status_code == 422
-
-        # Too fast
-        response2 = await client.post(
-            "/synthesize",
-            json={"text": "Test", "speed": 3.0}
-        )
-        assert response2.status_code == 422
-
-    @pytest.mark.asyncio
-    async def test_synthesize_long_text(self, client):
+    async def test_synthesize_long_text(self, synth_responses):
         """Test synthesis with longer text"""
-        long_text = (
-            "This is a longer piece of text to test the system's ability "
-            "to handle more realistic content. " * 20
-        )
-        response = await client.post(
-            "/synthesize",
-            json={"text": long_text}
-        )
+        response = synth_responses["long_text"]
         assert response.status_code == 200
-        data = response.json()
-        assert data["duration_seconds"] > 10  # Should be longer audio
+        data = jload(response)
+        # ~60 words: well past a one-sentence clip
+        assert data["duration_seconds"] > 5
+        assert data["duration_seconds"] > jload(synth_responses["basic"])["duration_seconds"] * 2
 
-    @pytest.mark.asyncio
-    async def test_synthesize_metadata(self, client):
+    async def test_synthesize_metadata(self, synth_responses):
         """Test that metadata is complete"""
-        response = await client.post(
-            "/synthesize",
-            json={"text": "Testing metadata."}
-        )
+        response = synth_responses["metadata"]
         assert response.status_code == 200
-        data = response.json()
+        data = jload(response)
         metadata = data["metadata"]
 
         assert "original_text_length" in metadata
@@ -264,17 +283,13 @@ class TestSynthesizeEndpoint:
         assert "audio_size_bytes" in metadata
         assert "base64_size_bytes" in metadata
         assert metadata["audio_size_bytes"] > 0
-        assert metadata["base64_size_bytes"] > 0
+        assert metadata["base64_size_bytes"] == (metadata["audio_size_bytes"] + 2) // 3 * 4
 
-    @pytest.mark.asyncio
     async def test_synthesize_rtf_reasonable(self, client):
         """Test that RTF is reasonable (< 1.0 for real-time)"""
-        response = await client.post(
-            "/synthesize",
-            json={"text": "Testing real-time factor."}
-        )
+        response = await synth(client, "Testing real-time factor.")
         assert response.status_code == 200
-        data = response.json()
+        data = jload(response)
 
         # RTF should be less than 1.0 for faster than real-time
         # On CPU, Kokoro typically achieves 0.2-0.4
@@ -284,31 +299,56 @@ class TestSynthesizeEndpoint:
 class TestErrorHandling:
     """Test error handling and responses"""
 
-    @pytest.mark.asyncio
-    async def test_text_preprocessing_error(self, client):
-        """Test text preprocessing error handling"""
-        # Text with only citations that will be removed
+    async def test_max_length_escaped_text_not_too_large(self, client):
+        """Test a maximum-length body with every character JSON-escaped passes the size check"""
+        # json.dumps escapes non-ASCII by default: 12 bytes per astral character.
+        # The out-of-range speed makes validation reject it without synthesis.
+        body = json.dumps({"text": "\U0001F600" * MAX_TEXT_LENGTH, "speed": 3.0})
         response = await client.post(
             "/synthesize",
-            json={
-                "text": "(Author, 2020)",
-                "preprocess": True,
-                "remove_citations": True
-            }
+            content=body,
+            headers={"content-type": "application/json"}
         )
+        assert response.status_code == 422
+
+    async def test_text_preprocessing_error(self, client):
+        """Test text preprocessing error handling"""
+        # Text with only citations that will be removed
+        response = await synth(client, "(Author, 2020)", preprocess=True, remove_citations=True)
         assert response.status_code == 400
-        data = response.json()
+        data = jload(response)
         assert data["success"] is False
         assert data["error"] == "TextPreprocessingError"
 
-    @pytest.mark.asyncio
-    async def test_whitespace_only_text(self, client):
-        """Test that whitespace-only text is rejected"""
-        response = await client.post(
-            "/synthesize",
-            json={"text": "   \n\t  "}
+    async def test_request_validation(self, client):
+        """Test invalid requests are rejected by validation before any synthesis"""
+        responses = await asyncio.gather(
+            *(synth(client, **payload) for payload in VALIDATION_CASES.values())
         )
-        assert response.status_code == 422  # Validation error
+        codes = {name: response.status_code for name, response in zip(VALIDATION_CASES, responses)}
+        assert codes == {name: 422 for name in VALIDATION_CASES}
+
+
+class TestWavEncoding:
+    """Test the direct PCM WAV encoder"""
+
+    def test_matches_soundfile(self):
+        """Test encoded bytes match soundfile's 16-bit PCM WAV output"""
+        audio = np.sin(np.linspace(0, 100, 2400, dtype=np.float32)) * 1.2
+        expected = io.BytesIO()
+        sf.write(expected, np.clip(audio, -1.0, 1.0), 24000, format='WAV', subtype='PCM_16')
+
+        original = audio.copy()
+        assert bytes(encode_wav_pcm16(audio, 24000)) == expected.getvalue()
+        assert np.array_equal(audio, original)
+
+    def test_int16_input(self):
+        """Test int16 samples are written unchanged"""
+        audio = np.array([0, 1, -1, 32767, -32768], dtype=np.int16)
+        decoded, sample_rate = sf.read(io.BytesIO(encode_wav_pcm16(audio, 16000)), dtype='int16')
+
+        assert sample_rate == 16000
+        assert np.array_equal(decoded, audio)
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ Unit tests for TTS Engine
 import pytest
 import numpy as np
 from tts_engine import (
+    CHUNK_CHARS,
+    CHUNK_PAUSE_SECONDS,
     TTSEngine,
     TextPreprocessor,
     TTSError,
@@ -37,6 +39,13 @@ class TestTextPreprocessor:
         assert "[1, 2, 3]" not in cleaned
         assert "Multiple studies" in cleaned
 
+    def test_preprocess_shortens_text(self):
+        """Test citation removal shortens text and disabling it keeps citations"""
+        text = "This study (Author, 2020) shows results [1]."
+        cleaned = TextPreprocessor.clean_text(text, remove_citations=True)
+        assert len(cleaned) < len(text)
+        assert TextPreprocessor.clean_text(text, remove_citations=False) == text
+
     def test_remove_et_al(self):
         """Test removal of et al."""
         text = "Research by Johnson et al. indicates this."
@@ -72,6 +81,24 @@ class TestTextPreprocessor:
         assert "\\int" not in cleaned
         assert "[equation]" in cleaned
 
+    def test_display_math_before_inline(self):
+        """Test a lone dollar sign isn't paired with the start of display math"""
+        text = "The cost is $5 per unit and $$a+b$$."
+        cleaned = TextPreprocessor.clean_text(text)
+        assert cleaned == "The cost is $5 per unit and [equation]."
+
+    def test_citation_removed_before_url(self):
+        """Test a citation right after a URL is removed before the URL pass"""
+        text = "Data at https://example.com/data.(Smith, 2020)"
+        cleaned = TextPreprocessor.clean_text(text)
+        assert cleaned == "Data at"
+
+    def test_ascii_separator_whitespace(self):
+        """Test ASCII separators like \\x1f count as whitespace in ASCII-only text"""
+        assert TextPreprocessor.clean_text("as in [1,\x1f2] ok fine") == "as in ok fine"
+        assert TextPreprocessor.clean_text("see https://x.org\x1fnext word") == "see next word"
+        assert TextPreprocessor.clean_text("see (Smith et al.,\x1f2020) now ok") == "see now ok"
+
     def test_normalize_quotes(self):
         """Test quote normalization"""
         text = "\u201cHello\u201d and \u2018world\u2019 with quotes."
@@ -95,6 +122,20 @@ class TestTextPreprocessor:
             # Text with only citations
             TextPreprocessor.clean_text("(Smith, 2020)")
 
+    def test_split_sentences(self):
+        """Test long text is split into chunks of whole sentences"""
+        sentence = "This is one sentence of a longer paper."
+        text = " ".join([sentence] * 40)
+        chunks = TextPreprocessor.split_sentences(text, max_chars=100)
+
+        assert len(chunks) > 1
+        assert all(len(chunk) <= 100 for chunk in chunks)
+        assert " ".join(chunks) == text
+
+    def test_split_sentences_short_text(self):
+        """Test short text stays in one chunk"""
+        assert TextPreprocessor.split_sentences("One. Two. three.") == ["One. Two. three."]
+
     def test_should_skip_section_references(self):
         """Test detection of references section"""
         assert TextPreprocessor.should_skip_section("References\n")
@@ -154,40 +195,38 @@ class TestTextPreprocessor:
         assert "transformers" in cleaned
 
 
-class TestTTSEngine:
-    """Test TTS Engine functionality"""
-
-    @pytest.fixture
-    def model_paths(self):
-        """Provide paths to test model files"""
-        return {
-            'model': '/tmp/kokoro_models/kokoro-v1.0.onnx',
-            'voices': '/tmp/kokoro_models/voices-v1.0.bin',
-        }
-
-    @pytest.fixture
-    def engine(self, model_paths):
-        """Create engine instance (requires model files)"""
-        try:
-            return TTSEngine(
-                model_path=model_paths['model'],
-                voices_path=model_paths['voices'],
-                auto_load=True,
-                auto_download=False,  # Don't download in tests
-            )
-        except FileNotFoundError:
-            pytest.skip("Model files not available")
+# Longer than CHUNK_CHARS, so it is synthesized in sentence chunks
+LONG_TEXT = " ".join(
+    f"Sentence number {i} describes one more step of the experiment in plain words."
+    for i in range(1, 11)
+)
 
-    def test_engine_initialization(self, model_paths):
-        """Test engine initialization"""
-        engine = TTSEngine(
+
+@pytest.fixture(scope="session")
+def model_paths():
+    """Provide paths to test model files"""
+    return {
+        'model': '/tmp/kokoro_models/kokoro-v1.0.onnx',
+        'voices': '/tmp/kokoro_models/voices-v1.0.bin',
+    }
+
+
+@pytest.fixture(scope="session")
+def engine(model_paths):
+    """Create one loaded engine shared by all tests (requires model files)"""
+    try:
+        return TTSEngine(
             model_path=model_paths['model'],
             voices_path=model_paths['voices'],
-            auto_load=False,
+            auto_load=True,
             auto_download=False,  # Don't download in tests
         )
-        assert not engine.is_loaded
-        assert engine.default_voice == "af_sarah"
+    except FileNotFoundError:
+        pytest.skip("Model files not available")
+
+
+class TestTTSEngine:
+    """Test TTS Engine functionality on the shared engine (tests must not modify it)"""
 
     def test_engine_load_model(self, engine):
         """Test model loading"""
@@ -197,7 +236,7 @@ class TestTTSEngine:
     def test_available_voices(self, engine):
         """Test getting available voices"""
         voices = engine.available_voices
-        assert isinstance(voices, list)
+        assert isinstance(voices, tuple)
         assert len(voices) > 10
         assert "af_sarah" in voices
 
@@ -246,14 +285,18 @@ class TestTTSEngine:
         assert metadata['voice'] == "am_michael"
         assert len(audio) > 0
 
+    def test_engine_duration_estimate(self, engine):
+        """Test duration estimate grows with text length and shrinks with speed"""
+        text = "Testing speech speed."
+        assert engine.estimate_duration(text, speed=1.5) < engine.estimate_duration(text, speed=1.0)
+        assert engine.estimate_duration(text * 2) > engine.estimate_duration(text)
+
     def test_synthesize_custom_speed(self, engine):
-        """Test synthesis with custom speed"""
+        """Test synthesis with custom speed (speed effect on audio: test_api speed test)"""
         text = "Testing speech speed."
-        audio_normal, _, meta_normal = engine.synthesize(text, speed=1.0)
         audio_fast, _, meta_fast = engine.synthesize(text, speed=1.5)
 
-        # Faster speed should produce shorter audio
-        assert len(audio_fast) < len(audio_normal)
+        assert len(audio_fast) > 0
         assert meta_fast['speed'] == 1.5
 
     def test_synthesize_with_preprocessing(self, engine):
@@ -278,11 +321,43 @@ class TestTTSEngine:
         assert metadata['original_text_length'] == metadata['processed_text_length']
         assert len(audio) > 0
 
+    def test_synthesize_long_text_in_chunks(self, engine):
+        """Test long text is synthesized per chunk and joined with pauses"""
+        assert len(LONG_TEXT) > CHUNK_CHARS
+        audio, sample_rate, metadata = engine.synthesize(LONG_TEXT, preprocess=False)
+
+        chunks = TextPreprocessor.split_sentences(LONG_TEXT)
+        assert metadata['chunks'] == len(chunks) > 1
+        assert sample_rate == 24000
+
+        # Duration is about the sum of the chunks plus the pauses between them
+        chunk_seconds = sum(
+            engine.synthesize(chunk, preprocess=False)[2]['duration_seconds']
+            for chunk in chunks
+        )
+        expected = chunk_seconds + CHUNK_PAUSE_SECONDS * (len(chunks) - 1)
+        assert metadata['duration_seconds'] == pytest.approx(expected, rel=0.05)
+
     def test_synthesize_invalid_voice_raises_error(self, engine):
         """Test that invalid voice raises error"""
         with pytest.raises(VoiceNotFoundError):
             engine.synthesize("Test", voice="invalid_voice")
 
+
+class TestTTSEngineLifecycle:
+    """Test engine construction and loading with their own instances"""
+
+    def test_engine_initialization(self, model_paths):
+        """Test engine initialization"""
+        engine = TTSEngine(
+            model_path=model_paths['model'],
+            voices_path=model_paths['voices'],
+            auto_load=False,
+            auto_download=False,  # Don't download in tests
+        )
+        assert not engine.is_loaded
+        assert engine.default_voice == "af_sarah"
+
     def test_model_not_loaded_error(self, model_paths):
         """Test that using unloaded model raises error"""
         engine = TTSEngine(
@@ -295,6 +370,52 @@ class TestTTSEngine:
         with pytest.raises(ModelNotLoadedError):
             engine.synthesize("Test")
 
+    def test_session_options(self, model_paths):
+        """Test session options are loaded with the configured settings"""
+        engine = TTSEngine(
+            model_path=model_paths['model'],
+            voices_path=model_paths['voices'],
+            auto_load=True,
+            auto_download=False,  # Don't download in tests
+            num_threads=2,
+            session_opts={"graph_opt": "basic", "arena": False},
+        )
+        assert engine.is_loaded
+
+        options = engine._session_options()
+        assert options.intra_op_num_threads == 2
+        assert options.inter_op_num_threads == 1
+        assert options.enable_cpu_mem_arena is False
+
+    def test_parallel_chunks(self, engine, model_paths):
+        """Test chunks synthesized on several threads join like sequential ones"""
+        parallel_engine = TTSEngine(
+            model_path=model_paths['model'],
+            voices_path=model_paths['voices'],
+            auto_load=True,
+            auto_download=False,  # Don't download in tests
+            chunk_workers=2,
+        )
+        audio, sample_rate, metadata = parallel_engine.synthesize(LONG_TEXT, preprocess=False)
+        sequential, _, sequential_metadata = engine.synthesize(LONG_TEXT, preprocess=False)
+
+        assert metadata['chunks'] == sequential_metadata['chunks'] > 1
+        assert sample_rate == 24000
+        assert len(audio) == pytest.approx(len(sequential), rel=0.05)
+
+    def test_invalid_session_option_raises_error(self, model_paths):
+        """Test that an unknown graph optimization level fails to load"""
+        engine = TTSEngine(
+            model_path=model_paths['model'],
+            voices_path=model_paths['voices'],
+            auto_load=False,
+            auto_download=False,  # Don't download in tests
+            session_opts={"graph_opt": "maximum"},
+        )
+
+        with pytest.raises(TTSError):
+            engine.load_model()
+
 
 if __name__ == "__main__":
     # Run tests with pytest
@@ -6,10 +6,12 @@ import re
 import time
 import logging
 import urllib.request
-from typing import Tuple, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, Dict, Any, List, FrozenSet
 from pathlib import Path
 
 import numpy as np
+import onnxruntime as ort
 from kokoro_onnx import Kokoro
 
 logger = logging.getLogger(__name__)
@@ -18,6 +20,26 @@ logger = logging.getLogger(__name__)
 MODEL_FILE_URL = "https://github.com/thewh1teagle/kokoro-onnx/releases/download/model-files-v1.0/kokoro-v1.0.onnx"
 VOICES_FILE_URL = "https://github.com/thewh1teagle/kokoro-onnx/releases/download/model-files-v1.0/voices-v1.0.bin"
 
+# Typical speaking rate at speed 1.0 (~150 words per minute)
+CHARS_PER_SECOND = 15.0
+
+# Texts longer than this are synthesized in sentence-aligned chunks, joined
+# with a short pause
+CHUNK_CHARS = 500
+CHUNK_PAUSE_SECONDS = 0.2
+
+# ONNX Runtime session option names accepted in session_opts
+GRAPH_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
 
 class TTSError(Exception):
     """Base exception for TTS-related errors"""
@@ -45,20 +67,58 @@ class TextPreprocessor:
     Removes citations, URLs, LaTeX, and other problematic patterns
     """
 
-    # Patterns to remove or clean
+    # Patterns to remove or clean, compiled once at import
     PATTERNS = {
-        'citations_parens': r'\([A-Z][a-z]+(?:\s+et\s+al\.?)?,?\s+\d{4}[a-z]?\)',  # (Author, 2020)
-        'citations_brackets': r'\[\d+(?:,\s*\d+)*\]',  # [1], [1, 2, 3]
-        'et_al': r'\s+et\s+al\.',  # et al.
-        'urls': r'https?://\S+',  # URLs
-        'emails': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # emails
-        'latex_inline': r'\$[^$]+\$',  # $equation$
-        'latex_display': r'\$\$[^$]+\$\$',  # $$equation$$
-        'latex_commands': r'\\[a-zA-Z]+\{[^}]*\}',  # \textbf{text}
-        'multiple_spaces': r'\s+',  # Multiple spaces
-        'parenthetical_abbrev': r'\((?:[A-Z]{2,}|[A-Z][a-z]+)\)',  # (TTS), (Api)
+        'citations_parens': re.compile(r'\([A-Z][a-z]+(?:\s+et\s+al\.?)?,?\s+\d{4}[a-z]?\)'),  # (Author, 2020)
+        'citations_brackets': re.compile(r'\[\d+(?:,\s*\d+)*\]'),  # [1], [1, 2, 3]
+        'et_al': re.compile(r'\s+et\s+al\.'),  # et al.
+        'urls': re.compile(r'https?://\S+'),  # URLs
+        'emails': re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),  # emails
+        'latex_inline': re.compile(r'\$[^$]+\$'),  # $equation$
+        'latex_display': re.compile(r'\$\$[^$]+\$\$'),  # $$equation$$
+        'latex_commands': re.compile(r'\\[a-zA-Z]+\{[^}]*\}'),  # \textbf{text}
+        'parenthetical_abbrev': re.compile(r'\((?:[A-Z]{2,}|[A-Z][a-z]+)\)'),  # (TTS), (Api)
+        'space_before_punct': re.compile(r' ([.,;:!?])'),  # "word ." -> "word." (after whitespace is collapsed)
+        'missing_space_after_punct': re.compile(r'([.,;:!?])([A-Za-z])'),  # "end.Next" -> "end. Next"
     }
 
+    # Same patterns with re.ASCII, used on ASCII-only text once whitespace is
+    # normalized to single spaces; \s differs from the Unicode patterns only
+    # on ASCII separators like \x1f, which normalization removes first
+    PATTERNS_ASCII = {name: re.compile(pattern.pattern, re.ASCII) for name, pattern in PATTERNS.items()}
+
+    # Removal passes in order as (pattern name, marker, replacement); each
+    # pass sees the previous passes' output and only runs when its marker (a
+    # substring every match contains) occurs in the text
+    CITATION_REMOVALS = (
+        ('citations_parens', '(', ''),
+        ('citations_brackets', '[', ''),
+        ('et_al', 'al.', ''),
+    )
+    OTHER_REMOVALS = (
+        ('urls', 'http', ''),
+        ('emails', '@', ''),
+        ('latex_display', '$$', ' [equation] '),
+        ('latex_inline', '$', ' [equation] '),
+        ('latex_commands', '\\', ''),
+        ('parenthetical_abbrev', '(', ''),
+    )
+    REMOVAL_PASSES = {
+        True: CITATION_REMOVALS + OTHER_REMOVALS,
+        False: OTHER_REMOVALS,
+    }
+
+    # Smart quotes -> straight quotes, applied in one str.translate pass
+    QUOTE_TABLE = str.maketrans({
+        '\u201c': '"',
+        '\u201d': '"',
+        '\u2018': "'",
+        '\u2019': "'",
+    })
+
+    # Whitespace between a sentence end and the next capitalized sentence
+    SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
     # Section headers to skip entirely
     SKIP_SECTIONS = [
         'references',
@@ -69,6 +129,8 @@ class TextPreprocessor:
         'acknowledgments',
         'acknowledgements',
     ]
+    # Any header above at the start of the text (after whitespace), any case
+    SKIP_PATTERN = re.compile(r'\s*(?:' + '|'.join(map(re.escape, SKIP_SECTIONS)) + ')', re.IGNORECASE)
 
     @classmethod
     def clean_text(cls, text: str, remove_citations: bool = True) -> str:
@@ -85,43 +147,35 @@ class TextPreprocessor:
         Raises:
             TextPreprocessingError: If text becomes empty after processing
         """
-        if not text or not text.strip():
+        if not text or text.isspace():
             raise TextPreprocessingError("Text is empty")
 
         original_length = len(text)
-        cleaned = text
 
         try:
-            # Remove citations if requested
-            if remove_citations:
-                cleaned = re.sub(cls.PATTERNS['citations_parens'], '', cleaned)
-                cleaned = re.sub(cls.PATTERNS['citations_brackets'], '', cleaned)
-                cleaned = re.sub(cls.PATTERNS['et_al'], '', cleaned)
-
-            # Remove URLs and emails
-            cleaned = re.sub(cls.PATTERNS['urls'], '', cleaned)
-            cleaned = re.sub(cls.PATTERNS['emails'], '', cleaned)
-
-            # Remove LaTeX
-            cleaned = re.sub(cls.PATTERNS['latex_display'], ' [equation] ', cleaned)
-            cleaned = re.sub(cls.PATTERNS['latex_inline'], ' [equation] ', cleaned)
-            cleaned = re.sub(cls.PATTERNS['latex_commands'], '', cleaned)
+            # Normalize whitespace (split/join, no regex pass) so the re.ASCII
+            # patterns see the same separators as the Unicode ones
+            cleaned = ' '.join(text.split())
 
-            # Remove parenthetical abbreviations
-            cleaned = re.sub(cls.PATTERNS['parenthetical_abbrev'], '', cleaned)
+            # Remove citations (if requested), URLs, emails, LaTeX and
+            # parenthetical abbreviations, skipping passes that can't match
+            patterns = cls.PATTERNS_ASCII if cleaned.isascii() else cls.PATTERNS
+            for name, marker, replacement in cls.REMOVAL_PASSES[remove_citations]:
+                if marker in cleaned:
+                    cleaned = patterns[name].sub(replacement, cleaned)
 
-            # Normalize whitespace
-            cleaned = re.sub(cls.PATTERNS['multiple_spaces'], ' ', cleaned)
+            # Collapse the spaces left around removed spans
+            cleaned = ' '.join(cleaned.split())
 
-            # Normalize quotes (using Unicode escapes)
-            cleaned = cleaned.replace('\u201c', '"').replace('\u201d', '"')  # Smart double quotes
-            cleaned = cleaned.replace('\u2018', "'").replace('\u2019', "'")  # Smart single quotes
+            # Normalize quotes (smart quotes are non-ASCII; isascii() is O(1))
+            if not cleaned.isascii():
+                cleaned = cleaned.translate(cls.QUOTE_TABLE)
 
             # Remove extra spaces around punctuation
-            cleaned = re.sub(r'\s+([.,;:!?])', r'\1', cleaned)
+            cleaned = cls.PATTERNS['space_before_punct'].sub(r'\1', cleaned)
 
             # Ensure space after punctuation
-            cleaned = re.sub(r'([.,;:!?])([A-Za-z])', r'\1 \2', cleaned)
+            cleaned = cls.PATTERNS['missing_space_after_punct'].sub(r'\1 \2', cleaned)
 
             # Strip leading/trailing whitespace
             cleaned = cleaned.strip()
@@ -156,14 +210,35 @@ class TextPreprocessor:
         Returns:
             True if text should be skipped
         """
-        text_lower = text.lower().strip()
+        # Anchored match: only the leading characters are read, no lowercased copy
+        return cls.SKIP_PATTERN.match(text) is not None
 
-        # Check if starts with skip section header
-        for section in cls.SKIP_SECTIONS:
-            if text_lower.startswith(section):
-                return True
+    @classmethod
+    def split_sentences(cls, text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+        """
+        Split text into chunks of whole sentences
 
-        return False
+        Consecutive sentences are grouped while the chunk stays within
+        max_chars; a single longer sentence becomes a chunk of its own.
+
+        Args:
+            text: Text to split
+            max_chars: Target maximum chunk length
+
+        Returns:
+            List of chunks, in order
+        """
+        chunks = []
+        current = ''
+        for sentence in cls.SENTENCE_BOUNDARY.split(text):
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f'{current} {sentence}' if current else sentence
+        if current:
+            chunks.append(current)
+        return chunks
 
     @classmethod
     def validate_text_length(cls, text: str, min_length: int = 1, max_length: int = 5000) -> None:
@@ -204,6 +279,9 @@ class TTSEngine:
         auto_download: bool = True,
         default_voice: str = "af_sarah",
         default_speed: float = 1.0,
+        num_threads: Optional[int] = None,
+        session_opts: Optional[Dict[str, Any]] = None,
+        chunk_workers: int = 1,
     ):
         """
         Initialize TTS engine
@@ -215,15 +293,24 @@ class TTSEngine:
             auto_download: Whether to auto-download missing model files
             default_voice: Default voice to use
             default_speed: Default speech speed
+            num_threads: ONNX Runtime intra-op threads (runtime default if None)
+            session_opts: ONNX Runtime settings: "graph_opt" (disable, basic,
+                extended, all), "execution_mode" (sequential, parallel) and
+                "arena" (bool, CPU memory arena)
+            chunk_workers: Chunks of a long text synthesized in parallel
         """
         self.model_path = Path(model_path)
         self.voices_path = Path(voices_path)
         self.auto_download = auto_download
         self.default_voice = default_voice
         self.default_speed = default_speed
+        self.num_threads = num_threads
+        self.session_opts = session_opts or {}
+        self.chunk_workers = max(1, chunk_workers)
 
         self._model: Optional[Kokoro] = None
-        self._available_voices: Optional[list] = None
+        self._available_voices: Optional[Tuple[str, ...]] = None
+        self._voice_set: FrozenSet[str] = frozenset()
         self._preprocessor = TextPreprocessor()
 
         # Download model files if missing and auto_download enabled
@@ -249,8 +336,11 @@ class TTSEngine:
         model_dir = self.model_path.parent
         model_dir.mkdir(parents=True, exist_ok=True)
 
-        # Download model file if missing
-        if not self.model_path.exists():
+        # Download model file if missing; other file names (e.g. an INT8 model
+        # from quantize_kokoro.py) are never overwritten with the FP32 model
+        if not self.model_path.exists() and self.model_path.name != MODEL_FILE_URL.rsplit("/", 1)[1]:
+            logger.warning(f"Model file not found at {self.model_path} (not a downloadable model file)")
+        elif not self.model_path.exists():
             logger.info(f"Model file not found at {self.model_path}")
             logger.info(f"Downloading model file from {MODEL_FILE_URL} (~310 MB)...")
             try:
@@ -281,6 +371,33 @@ class TTSEngine:
         else:
             logger.info(f"Voices file found at {self.voices_path}")
 
+    def _session_options(self) -> ort.SessionOptions:
+        """
+        Build ONNX Runtime session options from num_threads and session_opts
+
+        Defaults to full graph optimization (operator fusion), sequential
+        execution and the CPU memory arena, so buffers are reused across
+        requests instead of allocated per run.
+
+        Raises:
+            TTSError: If a session option value is not recognized
+        """
+        graph_opt = self.session_opts.get("graph_opt", "all")
+        execution_mode = self.session_opts.get("execution_mode", "sequential")
+        if graph_opt not in GRAPH_OPT_LEVELS:
+            raise TTSError(f"Unknown graph optimization level: {graph_opt}")
+        if execution_mode not in EXECUTION_MODES:
+            raise TTSError(f"Unknown execution mode: {execution_mode}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = GRAPH_OPT_LEVELS[graph_opt]
+        options.execution_mode = EXECUTION_MODES[execution_mode]
+        options.enable_cpu_mem_arena = self.session_opts.get("arena", True)
+        if self.num_threads is not None:
+            options.intra_op_num_threads = self.num_threads
+            options.inter_op_num_threads = 1
+        return options
+
     def load_model(self) -> None:
         """
         Load the Kokoro model
@@ -296,10 +413,16 @@ class TTSEngine:
             logger.info(f"Loading Kokoro model from {self.model_path}")
             start_time = time.time()
 
-            self._model = Kokoro(str(self.model_path), str(self.voices_path))
+            session = ort.InferenceSession(
+                str(self.model_path),
+                sess_options=self._session_options(),
+                providers=["CPUExecutionProvider"],
+            )
+            self._model = Kokoro.from_session(session, str(self.voices_path))
 
             # Cache available voices
-            self._available_voices = self._model.get_voices()
+            self._available_voices = tuple(self._model.get_voices())
+            self._voice_set = frozenset(self._available_voices)
 
             elapsed = time.time() - start_time
             logger.info(
@@ -308,7 +431,7 @@ class TTSEngine:
             )
 
             # Validate default voice
-            if self.default_voice not in self._available_voices:
+            if self.default_voice not in self._voice_set:
                 logger.warning(
                     f"Default voice '{self.default_voice}' not available, "
                     f"using '{self._available_voices[0]}'"
@@ -324,11 +447,11 @@ class TTSEngine:
         return self._model is not None
 
     @property
-    def available_voices(self) -> list:
-        """Get list of available voices"""
+    def available_voices(self) -> Tuple[str, ...]:
+        """Get available voices (immutable, so returned without copying)"""
         if not self.is_loaded:
             raise ModelNotLoadedError("Model not loaded")
-        return self._available_voices.copy()
+        return self._available_voices
 
     def validate_voice(self, voice: str) -> None:
         """
@@ -344,7 +467,7 @@ class TTSEngine:
         if not self.is_loaded:
             raise ModelNotLoadedError("Model not loaded")
 
-        if voice not in self._available_voices:
+        if voice not in self._voice_set:
             raise VoiceNotFoundError(
                 f"Voice '{voice}' not found. Available voices: "
                 f"{', '.join(self._available_voices[:10])}..."
@@ -366,6 +489,56 @@ class TTSEngine:
         """
         return self._preprocessor.clean_text(text, remove_citations)
 
+    def estimate_duration(self, text: str, speed: Optional[float] = None) -> float:
+        """
+        Estimate audio duration from text length, without synthesizing
+
+        Args:
+            text: Text as it would be synthesized
+            speed: Speech speed multiplier (uses default if None)
+
+        Returns:
+            Approximate duration in seconds (CHARS_PER_SECOND at speed 1.0)
+        """
+        speed = speed if speed is not None else self.default_speed
+        return len(text) / (CHARS_PER_SECOND * speed)
+
+    def _generate(self, text: str, voice: str, speed: float, lang: str) -> Tuple[np.ndarray, int, int]:
+        """
+        Run the model on text, in sentence chunks if it is long
+
+        Chunks run on up to chunk_workers threads (ONNX Runtime releases the
+        GIL during inference) and are joined with CHUNK_PAUSE_SECONDS of
+        silence.
+
+        Returns:
+            Tuple of (audio_array, sample_rate, chunk_count)
+        """
+        if len(text) <= CHUNK_CHARS:
+            audio, sample_rate = self._model.create(text=text, voice=voice, speed=speed, lang=lang)
+            return audio, sample_rate, 1
+
+        chunks = self._preprocessor.split_sentences(text)
+
+        def create(chunk):
+            return self._model.create(text=chunk, voice=voice, speed=speed, lang=lang)
+
+        workers = min(self.chunk_workers, len(chunks))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(create, chunks))
+        else:
+            results = [create(chunk) for chunk in chunks]
+
+        sample_rate = results[0][1]
+        pause = np.zeros(int(CHUNK_PAUSE_SECONDS * sample_rate), dtype=results[0][0].dtype)
+        parts = []
+        for audio, _ in results:
+            if parts:
+                parts.append(pause)
+            parts.append(audio)
+        return np.concatenate(parts), sample_rate, len(chunks)
+
     def synthesize(
         self,
         text: str,
@@ -420,12 +593,7 @@ class TTSEngine:
             start_time = time.time()
 
             # Generate audio
-            audio, sample_rate = self._model.create(
-                text=text,
-                voice=voice,
-                speed=speed,
-                lang=lang,
-            )
+            audio, sample_rate, chunk_count = self._generate(text, voice, speed, lang)
 
             processing_time = time.time() - start_time
             duration = len(audio) / sample_rate
@@ -441,6 +609,7 @@ class TTSEngine:
                 'speed': speed,
                 'sample_rate': sample_rate,
                 'audio_samples': len(audio),
+                'chunks': chunk_count,
             }
 
             logger.info(
@@ -3,16 +3,24 @@ Kokoro TTS Service - FastAPI Application
 High-quality TTS using Kokoro-82M model optimized for CPU
 """
 
+import io
 import os
 import time
 import asyncio
+import hashlib
+import queue
+import secrets
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 import logging
 import urllib.request
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 import numpy as np
 import soundfile as sf
@@ -31,15 +39,91 @@ app = FastAPI(
 # Configuration
 MODEL_PATH = os.getenv("MODEL_PATH", "/app/models")
 ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "8"))
+# Inference worker threads, i.e. syntheses run at once; each already uses
+# ONNX_NUM_THREADS threads
+SYNTH_CONCURRENCY = int(os.getenv("SYNTH_CONCURRENCY", "1"))
+# Generated files kept for identical repeat requests (0 disables)
+AUDIO_CACHE_SIZE = int(os.getenv("AUDIO_CACHE_SIZE", "512"))
+# Generated files older than this are deleted, checked every AUDIO_CLEANUP_INTERVAL
+AUDIO_MAX_AGE_SECONDS = int(os.getenv("AUDIO_MAX_AGE_SECONDS", "600"))
+AUDIO_CLEANUP_INTERVAL = int(os.getenv("AUDIO_CLEANUP_INTERVAL", "60"))
+# Refuse to write new files when less disk than this is free
+MIN_FREE_DISK_MB = int(os.getenv("MIN_FREE_DISK_MB", "100"))
 TEMP_AUDIO_DIR = Path("/tmp/tts_audio")
 TEMP_AUDIO_DIR.mkdir(exist_ok=True)
+# Private originals of cached audio: never served, deleted or aged out
+# directly; clients get their own link or copy in TEMP_AUDIO_DIR. Entries from
+# a previous process are unknown to the in-memory cache, so they are cleared.
+AUDIO_CACHE_DIR = Path("/tmp/tts_audio_cache")
+shutil.rmtree(AUDIO_CACHE_DIR, ignore_errors=True)
+AUDIO_CACHE_DIR.mkdir()
 
 # Model file URLs (from Hugging Face)
-MODEL_FILE_URL = "https://huggingface.co/hexgrad/Kokoro-82M/resolve/main/kokoro-v1.0.onnx"
+# Override MODEL_FILE_URL to use a quantized build, e.g.
+# https://huggingface.co/onnx-community/Kokoro-82M-v1.0-ONNX/resolve/main/onnx/model_q8f16.onnx
+MODEL_FILE_URL = os.getenv("MODEL_FILE_URL", "https://huggingface.co/hexgrad/Kokoro-82M/resolve/main/kokoro-v1.0.onnx")
 VOICES_FILE_URL = "https://huggingface.co/hexgrad/Kokoro-82M/resolve/main/voices-v1.0.bin"
+# Optional SHA-256 digests; when set, downloads that don't match are discarded
+MODEL_FILE_SHA256 = os.getenv("MODEL_FILE_SHA256", "").lower()
+VOICES_FILE_SHA256 = os.getenv("VOICES_FILE_SHA256", "").lower()
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Output formats: request format -> (file extension, soundfile format,
+# soundfile subtype, media type); "wav" is 16-bit PCM, half the size of
+# "wav_f32" and indistinguishable for speech
+AUDIO_FORMATS = {
+    "wav": ("wav", "WAV", "PCM_16", "audio/wav"),
+    "wav_f32": ("wav", "WAV", "FLOAT", "audio/wav"),
+    "mp3": ("mp3", "MP3", None, "audio/mpeg"),
+}
 
 # Global model instance (lazy loaded)
 kokoro_model = None
+# Serializes loading so concurrent first requests don't each build a model
+model_load_lock = asyncio.Lock()
+# Synthesis jobs as (function, request, future), served in arrival order by
+# SYNTH_CONCURRENCY dedicated inference threads
+inference_queue: "queue.Queue[tuple]" = queue.Queue()
+# Per-thread float32/int16 buffers reused by to_pcm16 (60 s at 24 kHz to start)
+pcm_scratch = threading.local()
+PCM_SCRATCH_SAMPLES = 60 * 24000
+# Request key -> (path in AUDIO_CACHE_DIR, duration, sample_rate), least
+# recently used first
+audio_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def download_file(url: str, dest: Path, sha256: str = ""):
+    """
+    Stream url to dest in 1 MiB chunks
+
+    Writes to a .part file that only replaces dest once complete (and
+    matching sha256, if given), so a failed download never leaves a
+    truncated model behind.
+    """
+    if dest.exists():
+        logger.info(f"{dest.name} already exists at {dest}")
+        return
+
+    logger.info(f"Downloading {dest.name} to {dest}...")
+    part = dest.with_name(dest.name + ".part")
+    try:
+        with urllib.request.urlopen(url) as response, open(part, "wb") as f:
+            shutil.copyfileobj(response, f, length=DOWNLOAD_CHUNK_SIZE)
+
+        if sha256:
+            digest = hashlib.sha256()
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            if digest.hexdigest() != sha256:
+                raise ValueError(f"SHA-256 mismatch for {dest.name}: got {digest.hexdigest()}")
+
+        os.replace(part, dest)
+        logger.info(f"{dest.name} downloaded successfully ({dest.stat().st_size / 1024 / 1024:.1f} MB)")
+    except Exception as e:
+        part.unlink(missing_ok=True)
+        logger.error(f"Failed to download {dest.name}: {e}")
+        raise
 
 
 def download_model_files():
@@ -47,30 +131,17 @@ def download_model_files():
     model_dir = Path(MODEL_PATH)
     model_dir.mkdir(parents=True, exist_ok=True)
 
-    model_file = model_dir / "kokoro-v1.0.onnx"
+    model_file = model_dir / MODEL_FILE_URL.rsplit("/", 1)[-1]
     voices_file = model_dir / "voices-v1.0.bin"
 
-    if not model_file.exists():
-        logger.info(f"Downloading model file to {model_file}...")
-        try:
-            urllib.request.urlretrieve(MODEL_FILE_URL, model_file)
-            logger.info(f"Model file downloaded successfully ({model_file.stat().st_size / 1024 / 1024:.1f} MB)")
-        except Exception as e:
-            logger.error(f"Failed to download model file: {e}")
-            raise
-    else:
-        logger.info(f"Model file already exists at {model_file}")
-
-    if not voices_file.exists():
-        logger.info(f"Downloading voices file to {voices_file}...")
-        try:
-            urllib.request.urlretrieve(VOICES_FILE_URL, voices_file)
-            logger.info(f"Voices file downloaded successfully ({voices_file.stat().st_size / 1024 / 1024:.1f} MB)")
-        except Exception as e:
-            logger.error(f"Failed to download voices file: {e}")
-            raise
-    else:
-        logger.info(f"Voices file already exists at {voices_file}")
+    # The two downloads are independent, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        downloads = [
+            pool.submit(download_file, MODEL_FILE_URL, model_file, MODEL_FILE_SHA256),
+            pool.submit(download_file, VOICES_FILE_URL, voices_file, VOICES_FILE_SHA256),
+        ]
+        for download in downloads:
+            download.result()
 
     return str(model_file), str(voices_file)
 
@@ -79,7 +150,7 @@ class TTSRequest(BaseModel):
     text: str = Field(..., description="Text to convert to speech", min_length=1)
     voice: Optional[str] = Field("af_sarah", description="Voice to use (e.g., af_sarah, bf_emma)")
     speed: Optional[float] = Field(1.0, description="Speech speed multiplier", ge=0.5, le=2.0)
-    format: Optional[str] = Field("wav", description="Audio format (wav or mp3)")
+    format: Optional[str] = Field("wav", description="Audio format (wav, wav_f32 or mp3)")
 
 
 class TTSResponse(BaseModel):
@@ -96,6 +167,15 @@ class HealthResponse(BaseModel):
     version: str
 
 
+def create_session_options(ort):
+    """ONNX Runtime options: full graph optimization and ONNX_NUM_THREADS intra-op threads"""
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    sess_options.intra_op_num_threads = ONNX_NUM_THREADS
+    sess_options.enable_mem_pattern = True
+    return sess_options
+
+
 def load_kokoro_model():
     """Load Kokoro model with ONNX optimizations"""
     global kokoro_model
@@ -109,6 +189,7 @@ def load_kokoro_model():
 
         # Import and configure kokoro
         try:
+            import onnxruntime as ort
             from kokoro_onnx import Kokoro
 
             # Download model files if needed
@@ -116,7 +197,12 @@ def load_kokoro_model():
 
             # Initialize Kokoro with both required files
             logger.info(f"Initializing Kokoro with model: {model_file}, voices: {voices_file}")
-            kokoro_model = Kokoro(model_file, voices_file)
+            session = ort.InferenceSession(
+                model_file,
+                sess_options=create_session_options(ort),
+                providers=["CPUExecutionProvider"]
+            )
+            kokoro_model = Kokoro.from_session(session, voices_file)
 
             logger.info("Kokoro model loaded successfully")
             return kokoro_model
@@ -132,26 +218,100 @@ def load_kokoro_model():
         raise
 
 
+def inference_worker():
+    """Run queued synthesis jobs, one at a time, for the life of the process"""
+    while True:
+        func, request, future = inference_queue.get()
+        if not future.set_running_or_notify_cancel():
+            continue  # Caller went away before the job started
+        try:
+            future.set_result(func(request))
+        except BaseException as e:
+            future.set_exception(e)
+
+
+def start_inference_workers():
+    """Start the SYNTH_CONCURRENCY inference threads"""
+    for i in range(SYNTH_CONCURRENCY):
+        threading.Thread(target=inference_worker, name=f"inference-{i}", daemon=True).start()
+
+
+async def run_inference(func, request: TTSRequest):
+    """Queue func(request) for an inference thread and wait for its result"""
+    future = Future()
+    inference_queue.put((func, request, future))
+    return await asyncio.wrap_future(future)
+
+
+async def ensure_model_loaded():
+    """Load the model in a worker thread, at most once, without blocking the event loop"""
+    if kokoro_model is not None:
+        return kokoro_model
+
+    async with model_load_lock:
+        return await asyncio.to_thread(load_kokoro_model)
+
+
 class FallbackTTS:
     """Fallback TTS for development/testing when Kokoro is not available"""
 
     def __init__(self):
         self.sample_rate = 22050
+        # Shared read-only silence, returned as views; grown when a longer clip is needed
+        self._silence = self._allocate_silence(60 * self.sample_rate)
         logger.warning("Using fallback TTS - Kokoro not available")
 
+    @staticmethod
+    def _allocate_silence(samples: int) -> np.ndarray:
+        silence = np.zeros(samples, dtype=np.float32)
+        silence.flags.writeable = False
+        return silence
+
     def create(self, text: str, voice: str = "af_sarah", speed: float = 1.0, lang: str = "en-us"):
         """Generate dummy audio (silence) for testing"""
         duration = len(text) * 0.05  # Rough estimate: 50ms per character
         samples = int(self.sample_rate * duration / speed)
-        audio = np.zeros(samples, dtype=np.float32)
-        return audio, self.sample_rate
+        if samples > self._silence.size:
+            self._silence = self._allocate_silence(samples)
+        return self._silence[:samples], self.sample_rate
+
+
+def delete_old_audio_files(max_age: float) -> int:
+    """Delete files in TEMP_AUDIO_DIR not modified for max_age seconds; returns the count"""
+    cutoff = time.time() - max_age
+    deleted = 0
+    for path in TEMP_AUDIO_DIR.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                deleted += 1
+        except FileNotFoundError:
+            pass  # Deleted through DELETE /audio/{filename} meanwhile
+    return deleted
+
+
+async def audio_cleanup_loop():
+    """Periodically delete old generated files so TEMP_AUDIO_DIR can't grow without bound"""
+    while True:
+        await asyncio.sleep(AUDIO_CLEANUP_INTERVAL)
+        try:
+            deleted = await asyncio.to_thread(delete_old_audio_files, AUDIO_MAX_AGE_SECONDS)
+            if deleted:
+                logger.info(f"Deleted {deleted} audio files older than {AUDIO_MAX_AGE_SECONDS}s")
+        except Exception as e:
+            logger.error(f"Audio cleanup failed: {str(e)}")
 
 
 @app.on_event("startup")
 async def startup_event():
     """Load model on startup"""
+    start_inference_workers()
+
+    # Keep a reference so the task isn't garbage collected
+    app.state.audio_cleanup_task = asyncio.create_task(audio_cleanup_loop())
+
     try:
-        load_kokoro_model()
+        await ensure_model_loaded()
         logger.info("TTS service started successfully")
     except Exception as e:
         logger.error(f"Failed to load model on startup: {str(e)}")
@@ -168,39 +328,207 @@ async def health_check():
     )
 
 
+def audio_cache_key(request: TTSRequest) -> str:
+    """Key for a request's audio (blake2b: fast, and only used for lookup)"""
+    key = f"{request.voice}|{request.speed}|en-us|{request.format}|{request.text}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def new_audio_filename(extension: str) -> str:
+    """Unique name for a generated file in TEMP_AUDIO_DIR"""
+    return f"tts_{int(time.time() * 1000)}_{secrets.token_hex(4)}.{extension}"
+
+
+def link_or_copy(source: Path, target: Path):
+    """Hard-link source to target, copying if the filesystem can't link"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def cached_audio(key: str):
+    """(cache path, duration, sample_rate) for key, if cached"""
+    entry = audio_cache.get(key)
+    if entry is None:
+        return None
+    if not entry[0].exists():
+        del audio_cache[key]
+        return None
+    audio_cache.move_to_end(key)
+    return entry
+
+
+def hand_out_cached_audio(cache_path: Path) -> str:
+    """
+    Give a request its own file for cached audio and return its filename
+
+    The link shares the cached original's data, but a DELETE /audio/{filename}
+    or cleanup of it leaves the original and other requests' files alone.
+    """
+    filename = new_audio_filename(cache_path.suffix[1:])
+    link_or_copy(cache_path, TEMP_AUDIO_DIR / filename)
+    # A hard link keeps the original's mtime; the cleanup task should count
+    # this file's age from now
+    os.utime(TEMP_AUDIO_DIR / filename)
+    return filename
+
+
+def cache_audio(key: str, filename: str, duration: float, sample_rate: int):
+    """Keep a private copy of a generated file, deleting the least recently used beyond AUDIO_CACHE_SIZE"""
+    if AUDIO_CACHE_SIZE <= 0 or key in audio_cache:
+        return
+    cache_path = AUDIO_CACHE_DIR / f"{key}{Path(filename).suffix}"
+    link_or_copy(TEMP_AUDIO_DIR / filename, cache_path)
+    audio_cache[key] = (cache_path, duration, sample_rate)
+    while len(audio_cache) > AUDIO_CACHE_SIZE:
+        _, (evicted_path, _, _) = audio_cache.popitem(last=False)
+        evicted_path.unlink(missing_ok=True)
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """
+    Scale float samples in [-1, 1] to int16, rounding to nearest like
+    soundfile and v2's encode_wav_pcm16
+
+    Works in place in this thread's scratch buffers, so no arrays are
+    allocated per request; the result is only valid until the thread's next
+    call.
+    """
+    samples = audio.size
+    if getattr(pcm_scratch, "floats", None) is None or pcm_scratch.floats.size < samples:
+        size = max(samples, PCM_SCRATCH_SAMPLES)
+        pcm_scratch.floats = np.empty(size, dtype=np.float32)
+        pcm_scratch.pcm = np.empty(size, dtype=np.int16)
+
+    scaled = pcm_scratch.floats[:samples]
+    np.multiply(audio, 32767.0, out=scaled)
+    np.clip(scaled, -32767, 32767, out=scaled)
+    np.rint(scaled, out=scaled)
+    pcm = pcm_scratch.pcm[:samples]
+    np.copyto(pcm, scaled, casting='unsafe')
+    return pcm
+
+
+def write_audio(target, audio: np.ndarray, sample_rate: int, audio_format: str):
+    """Write audio to a path or file object in one of AUDIO_FORMATS"""
+    _, file_format, subtype, _ = AUDIO_FORMATS[audio_format]
+    if subtype == "PCM_16":
+        # Convert once here so soundfile writes the samples as they are
+        audio = to_pcm16(audio)
+    sf.write(target, audio, sample_rate, format=file_format, subtype=subtype)
+
+
+def synthesize_to_file(request: TTSRequest):
+    """Generate audio for request and save it to TEMP_AUDIO_DIR (blocking)"""
+    audio, sample_rate = kokoro_model.create(
+        text=request.text,
+        voice=request.voice,
+        speed=request.speed,
+        lang="en-us"
+    )
+
+    extension = AUDIO_FORMATS[request.format][0]
+    filename = new_audio_filename(extension)
+    write_audio(str(TEMP_AUDIO_DIR / filename), audio, sample_rate, request.format)
+
+    return audio, sample_rate, filename
+
+
+def synthesize_to_bytes(request: TTSRequest):
+    """Generate audio for request as in-memory file bytes (blocking)"""
+    audio, sample_rate = kokoro_model.create(
+        text=request.text,
+        voice=request.voice,
+        speed=request.speed,
+        lang="en-us"
+    )
+
+    buffer = io.BytesIO()
+    write_audio(buffer, audio, sample_rate, request.format)
+
+    return buffer.getvalue(), len(audio) / sample_rate, sample_rate
+
+
+def inline_audio_headers(duration: float, sample_rate: int, processing_time: float) -> dict:
+    """TTSResponse fields for an inline audio response"""
+    return {
+        "X-Duration": f"{duration:.3f}",
+        "X-Sample-Rate": str(sample_rate),
+        "X-Processing-Time": f"{processing_time:.3f}",
+    }
+
+
 @app.post("/generate", response_model=TTSResponse)
-async def generate_tts(request: TTSRequest):
+async def generate_tts(request: TTSRequest, inline: bool = False):
     """
     Generate TTS audio from text
 
     Returns a JSON response with the path to the generated audio file.
     The audio file should be retrieved using the /audio/{filename} endpoint.
+
+    With ?inline=true the audio file is returned directly instead (duration, sample
+    rate and processing time in X- headers), without writing a file.
     """
     start_time = time.time()
 
+    if request.format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{request.format}' (use {', '.join(AUDIO_FORMATS)})"
+        )
+
     try:
+        # Identical request already generated: reuse its audio
+        cache_key = audio_cache_key(request)
+        cached = cached_audio(cache_key)
+        if cached is not None:
+            cache_path, duration, sample_rate = cached
+            logger.info(f"TTS cache hit for {len(request.text)} characters")
+            if inline:
+                return FileResponse(
+                    path=str(cache_path),
+                    media_type=AUDIO_FORMATS[request.format][3],
+                    headers=inline_audio_headers(duration, sample_rate, time.time() - start_time)
+                )
+            filename = hand_out_cached_audio(cache_path)
+            return TTSResponse(
+                audio_path=f"/audio/{filename}",
+                duration=duration,
+                sample_rate=sample_rate,
+                text_length=len(request.text),
+                processing_time=time.time() - start_time
+            )
+
         # Load model if not already loaded
-        if kokoro_model is None:
-            load_kokoro_model()
+        await ensure_model_loaded()
 
         logger.info(f"Generating TTS for {len(request.text)} characters")
 
-        # Generate audio using Kokoro
-        audio, sample_rate = kokoro_model.create(
-            text=request.text,
-            voice=request.voice,
-            speed=request.speed,
-            lang="en-us"
-        )
+        if inline:
+            audio_bytes, duration, sample_rate = await run_inference(synthesize_to_bytes, request)
+            processing_time = time.time() - start_time
+            logger.info(f"TTS generated in {processing_time:.2f}s - Duration: {duration:.2f}s (inline)")
+            return Response(
+                content=audio_bytes,
+                media_type=AUDIO_FORMATS[request.format][3],
+                headers=inline_audio_headers(duration, sample_rate, processing_time)
+            )
+
+        free_mb = shutil.disk_usage(TEMP_AUDIO_DIR).free / 1024 / 1024
+        if free_mb < MIN_FREE_DISK_MB:
+            raise HTTPException(
+                status_code=507,
+                detail=f"Not enough disk space for audio files ({free_mb:.0f} MB free), use ?inline=true"
+            )
+
+        # Inference and file write run on an inference thread so the event
+        # loop keeps serving other requests
+        audio, sample_rate, filename = await run_inference(synthesize_to_file, request)
 
         # Calculate duration
         duration = len(audio) / sample_rate
-
-        # Save audio file
-        filename = f"tts_{int(time.time() * 1000)}.{request.format}"
-        audio_path = TEMP_AUDIO_DIR / filename
-
-        sf.write(str(audio_path), audio, sample_rate)
+        cache_audio(cache_key, filename, duration, sample_rate)
 
         processing_time = time.time() - start_time
 
@@ -214,6 +542,8 @@ async def generate_tts(request: TTSRequest):
             processing_time=processing_time
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating TTS: {str(e)}")
         raise HTTPException(status_code=500, detail=f"TTS generation failed: {str(e)}")
@@ -276,7 +606,7 @@ async def root():
         "model": "kokoro-82m",
         "endpoints": {
             "health": "/health",
-            "generate": "/generate (POST)",
+            "generate": "/generate (POST, ?inline=true for the audio file itself)",
             "voices": "/voices",
             "audio": "/audio/{filename}"
         }